@@ -0,0 +1,172 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import cache
+from threading import Lock
+
+import numpy as np
+
+from backend.rag.call_embeddings import embed_query
+from backend.rag.vector_db_name_generation import replace_polish_chars
+
+
+log = logging.getLogger("__name__")
+
+# Maximum number of answers kept before the least recently used ones are evicted
+ANSWER_CACHE_SIZE = 512
+# Answers older than this are regenerated
+ANSWER_CACHE_TTL_SECONDS = 6 * 3600
+# Minimum cosine similarity of two prompts for a cached answer to be reused (opt-in);
+# None only matches normalized-identical prompts. Related but different questions
+# ("risks" vs "benefits" of a regulation) can exceed 0.95 with embedding-001
+SEMANTIC_MATCH_THRESHOLD: float | None = None
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalizes a prompt for exact cache matching.
+
+    Case, Polish diacritics, surrounding punctuation and repeated whitespace are ignored,
+    e.g. "Jakie są wymagania?" and "jakie sa  wymagania" normalize to the same key.
+    """
+    folded = replace_polish_chars(prompt.lower())
+    return re.sub(r"\s+", " ", folded).strip(" \t\n.,;:!?\"'")
+
+
+class _CachedAnswer:
+    def __init__(
+        self, answer: str, embedding: np.ndarray | None, created: float
+    ) -> None:
+        self.answer = answer
+        self.embedding = embedding
+        self.created = created
+
+
+class AnswerCache:
+    """
+    In-memory cache of generated answers with TTL and LRU eviction.
+
+    Answers are stored per scope, a hashable tuple of everything besides the prompt
+    that shapes the answer (collection and its ingest version, model, temperature, UI
+    flags). Within a scope a
+    prompt matches when its normalized form is identical or, if an embedding function
+    and threshold are given, when its embedding is similar enough to a cached prompt.
+
+    Args:
+        max_entries: Maximum number of cached answers.
+        ttl_seconds: Lifetime of a cached answer.
+        embed: Optional function returning the embedding of a prompt.
+        similarity_threshold: Minimum cosine similarity for a semantic match.
+        clock: Function returning the current time in seconds, used for the TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        embed: Callable[[str], list[float]] | None = None,
+        similarity_threshold: float | None = SEMANTIC_MATCH_THRESHOLD,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed if similarity_threshold is not None else None
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._entries: OrderedDict[tuple[Hashable, str], _CachedAnswer] = OrderedDict()
+        self._lock = Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _embedding(self, prompt: str) -> np.ndarray | None:
+        if self.embed is None:
+            return None
+        try:
+            vector = np.asarray(self.embed(prompt), dtype=np.float32)
+        except Exception as e:
+            log.warning(f"Prompt embedding for the answer cache failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry: _CachedAnswer) -> bool:
+        return self.clock() - entry.created > self.ttl_seconds
+
+    def get(self, scope: Hashable, prompt: str) -> str | None:
+        """
+        Returns the cached answer to prompt within scope, or None on a miss.
+
+        Args:
+            scope: Hashable tuple of the answer-shaping settings.
+            prompt: The user's prompt.
+        """
+        key = (scope, normalize_prompt(prompt))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.answer
+            has_candidates = any(k[0] == scope for k in self._entries)
+
+        query = self._embedding(prompt) if has_candidates else None
+        if query is not None and self.similarity_threshold is not None:
+            with self._lock:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate_key, candidate in self._entries.items():
+                    if (
+                        candidate_key[0] != scope
+                        or candidate.embedding is None
+                        or self._expired(candidate)
+                    ):
+                        continue
+                    score = float(candidate.embedding @ query)
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    log.debug(
+                        f"Semantic answer cache hit ({best_score:.3f}): "
+                        f"'{prompt[:60]}' ~ '{best_key[1][:60]}'"
+                    )
+                    return self._entries[best_key].answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, scope: Hashable, prompt: str, answer: str) -> None:
+        """Stores the answer (markdown) generated for prompt within scope."""
+        entry = _CachedAnswer(answer, self._embedding(prompt), self.clock())
+        with self._lock:
+            key = (scope, normalize_prompt(prompt))
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current hit rate."""
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+@cache
+def get_answer_cache() -> AnswerCache:
+    """Returns the process-wide answer cache, creating it on first use."""
+    # same embedding as the retrieval query, so lookups cost no extra request
+    return AnswerCache(embed=embed_query)
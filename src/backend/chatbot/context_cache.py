@@ -0,0 +1,189 @@
+import datetime
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+from threading import Lock
+from typing import Any, TypedDict, cast
+
+import google.generativeai as genai  # type: ignore[unused-ignore]
+from google.generativeai import caching
+
+from backend.utils.atomic_write import write_json_atomic
+from backend.utils.paths import CACHE_DIR
+
+
+log = logging.getLogger("__name__")
+
+CONTEXT_CACHE_INDEX_PATH = CACHE_DIR / "uploads" / "context_caches.json"
+# Lifetime of a provider-side cached context (billed per hour of storage)
+CONTEXT_CACHE_TTL_SECONDS = 3600
+# Cached contexts expiring sooner than this are recreated instead of reused
+REUSE_MARGIN_SECONDS = 120
+# After caching failed for a context (e.g. too small, unsupported model) it is not
+# retried for this long and requests fall back to sending the context inline
+UNAVAILABLE_RETRY_SECONDS = 600
+
+
+class ContextCacheEntry(TypedDict):
+    name: str
+    model: str
+    display_name: str
+    token_count: int
+    ttl_seconds: int
+    expires_at: float
+    created: float
+
+
+class ContextCache:
+    """
+    Index of Gemini cached contents (provider-side context caching).
+
+    A large, stable prefix of a request (a whole PDF, or all passages of a document)
+    is stored once with the provider and later requests reference it, so its tokens
+    are neither re-sent nor billed at the full input rate on every turn. The local
+    index records each cached content's name, TTL and token count and survives
+    restarts. When caching is not available, get_model() returns None and the caller
+    sends the context inline as before.
+
+    Args:
+        path: Location of the JSON index.
+    """
+
+    def __init__(self, path: Path = CONTEXT_CACHE_INDEX_PATH) -> None:
+        self.path = path
+        self._lock = Lock()
+        # one lock per cached context, so creating one does not wait for another
+        self._create_locks: dict[str, Lock] = {}
+        self._entries: dict[str, ContextCacheEntry] = self._load()
+        self._models: dict[str, genai.GenerativeModel] = {}
+        self._unavailable: dict[str, float] = {}
+
+    def _load(self) -> dict[str, ContextCacheEntry]:
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    return cast(dict[str, ContextCacheEntry], json.load(f))
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring unreadable context cache index {self.path}: {e}")
+        return {}
+
+    def _save(self) -> None:
+        """Writes the index atomically (lock held)."""
+        write_json_atomic(self.path, self._entries)
+
+    @staticmethod
+    def _cache_key(model: genai.GenerativeModel, content_key: str) -> str:
+        # the SDK has no public accessor for the system instruction, which is part of
+        # the cached content and therefore of its identity
+        system_instruction = getattr(model, "_system_instruction", None)
+        identity = f"{model.model_name}\n{system_instruction}\n{content_key}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _live_entry(self, key: str) -> ContextCacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None or entry["expires_at"] - time.time() <= REUSE_MARGIN_SECONDS:
+            return None
+        return entry
+
+    def _create(
+        self,
+        model: genai.GenerativeModel,
+        key: str,
+        display_name: str,
+        contents: list[Any],
+    ) -> ContextCacheEntry:
+        started = time.perf_counter()
+        cached = caching.CachedContent.create(
+            model=model.model_name,
+            display_name=display_name[:120],
+            system_instruction=getattr(model, "_system_instruction", None),
+            contents=contents,
+            ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS),
+        )
+        entry: ContextCacheEntry = {
+            "name": cached.name,
+            "model": model.model_name,
+            "display_name": display_name,
+            "token_count": int(cached.usage_metadata.total_token_count),
+            "ttl_seconds": CONTEXT_CACHE_TTL_SECONDS,
+            "expires_at": cached.expire_time.timestamp(),
+            "created": time.time(),
+        }
+        log.info(
+            f"Created cached context '{display_name}' ({entry['token_count']} tokens, "
+            f"ttl {CONTEXT_CACHE_TTL_SECONDS}s) in {time.perf_counter() - started:.2f}s."
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._models[entry["name"]] = genai.GenerativeModel.from_cached_content(
+                cached
+            )
+            self._save()
+        return entry
+
+    def get_model(
+        self,
+        model: genai.GenerativeModel,
+        content_key: str,
+        display_name: str,
+        build_contents: Callable[[], list[Any]],
+    ) -> genai.GenerativeModel | None:
+        """
+        Returns a model whose context holds the given contents, creating the cache once.
+
+        Args:
+            model: The model requests would otherwise be sent to.
+            content_key: Stable identifier of the contents (e.g. file hash, collection).
+            display_name: Human readable name of the cached content.
+            build_contents: Called only when the cached content has to be created.
+
+        Returns:
+            A GenerativeModel referencing the cached content, or None when context
+            caching is unavailable for these contents.
+        """
+        key = self._cache_key(model, content_key)
+        with self._lock:
+            create_lock = self._create_locks.setdefault(key, Lock())
+        try:
+            with create_lock:
+                with self._lock:
+                    if self._unavailable.get(key, 0.0) > time.time():
+                        return None
+                    entry = self._live_entry(key)
+                if entry is None:
+                    entry = self._create(model, key, display_name, build_contents())
+            with self._lock:
+                cached_model = self._models.get(entry["name"])
+            if cached_model is None:
+                cached_model = genai.GenerativeModel.from_cached_content(entry["name"])
+                with self._lock:
+                    self._models[entry["name"]] = cached_model
+            return cached_model
+        except Exception as e:
+            log.warning(
+                f"Context caching unavailable for '{display_name}', sending the "
+                f"context inline: {e}"
+            )
+            with self._lock:
+                self._unavailable[key] = time.time() + UNAVAILABLE_RETRY_SECONDS
+                self._entries.pop(key, None)
+            return None
+
+    def forget(self, model: genai.GenerativeModel, content_key: str) -> None:
+        """Drops a cached context from the index, e.g. when the provider deleted it."""
+        key = self._cache_key(model, content_key)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._models.pop(entry["name"], None)
+                self._save()
+
+
+@cache
+def get_context_cache() -> ContextCache:
+    """Returns the process-wide context cache index, creating it on first use."""
+    return ContextCache()
@@ -0,0 +1,226 @@
+import json
+import logging
+import time
+from concurrent.futures import Future
+from functools import cache
+from pathlib import Path
+from threading import Lock, Thread
+from typing import TypedDict, cast
+
+import google.generativeai as genai  # type: ignore[unused-ignore]
+
+from backend.utils.file_hash import file_sha256
+from backend.utils.atomic_write import write_json_atomic
+from backend.utils.rate_limiter import RequestScheduler
+from backend.utils.paths import CACHE_DIR
+
+
+log = logging.getLogger("__name__")
+
+UPLOAD_REGISTRY_PATH = CACHE_DIR / "uploads" / "gemini_uploads.json"
+# Files API uploads are deleted after 48 hours
+UPLOAD_LIFETIME_SECONDS = 48 * 3600
+# Uploads expiring sooner than this are not reused (a long answer must not outlive them)
+REUSE_MARGIN_SECONDS = 3600
+# Number of most-used documents kept uploaded by the background pre-warmer
+PREWARM_TOP_N = 10
+# How often the pre-warmer checks for expiring uploads
+PREWARM_INTERVAL_SECONDS = 1800
+
+# Files API quota (uploads)
+UPLOAD_REQUESTS_PER_MINUTE = 100
+
+PDF_MIME_TYPE = "application/pdf"
+
+upload_scheduler = RequestScheduler(UPLOAD_REQUESTS_PER_MINUTE)
+
+
+class UploadEntry(TypedDict):
+    name: str
+    uri: str
+    mime_type: str
+    source: str
+    expires_at: float
+    uses: int
+    last_used: float
+
+
+class FileUploadCache:
+    """
+    Registry of PDFs uploaded to the Gemini Files API, keyed by content hash.
+
+    A live upload is reused by its URI, so asking another question about the same PDF
+    needs no upload and no Files API request; a PDF is uploaded again only when its
+    upload expired (or is about to). Concurrent requests for the same PDF share one
+    upload. Use counts are kept so the most-used documents can be pre-warmed.
+
+    Args:
+        path: Location of the JSON registry.
+    """
+
+    def __init__(self, path: Path = UPLOAD_REGISTRY_PATH) -> None:
+        self.path = path
+        self._lock = Lock()
+        self._entries: dict[str, UploadEntry] = self._load()
+        self._in_flight: dict[str, Future] = {}
+        # (path, size, mtime) -> sha256, so unchanged PDFs are not re-hashed
+        self._hashes: dict[tuple[str, int, float], str] = {}
+        self._prewarmer: Thread | None = None
+
+    def _load(self) -> dict[str, UploadEntry]:
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    return cast(dict[str, UploadEntry], json.load(f))
+            except (OSError, ValueError) as e:
+                log.warning(f"Ignoring unreadable upload registry {self.path}: {e}")
+        return {}
+
+    def _save(self) -> None:
+        """Writes the registry atomically (lock held)."""
+        write_json_atomic(self.path, self._entries)
+
+    def _file_hash(self, pdf: Path) -> str:
+        stat = pdf.stat()
+        key = (str(pdf.resolve()), stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            self._hashes[key] = file_sha256(pdf)
+        return self._hashes[key]
+
+    @staticmethod
+    def _is_live(entry: UploadEntry | None) -> bool:
+        return (
+            entry is not None
+            and entry["expires_at"] - time.time() > REUSE_MARGIN_SECONDS
+        )
+
+    def _upload(self, file_hash: str, pdf: Path) -> UploadEntry:
+        started = time.perf_counter()
+        uploaded = upload_scheduler.call(
+            "files", genai.upload_file, pdf, mime_type=PDF_MIME_TYPE
+        )
+        expiration = getattr(uploaded, "expiration_time", None)
+        expires_at = (
+            expiration.timestamp()
+            if expiration is not None
+            else time.time() + UPLOAD_LIFETIME_SECONDS
+        )
+        log.info(
+            f"Uploaded {pdf.name} to the Files API in "
+            f"{time.perf_counter() - started:.2f}s as {uploaded.name}."
+        )
+        with self._lock:
+            previous = self._entries.get(file_hash)
+            entry: UploadEntry = {
+                "name": uploaded.name,
+                "uri": uploaded.uri,
+                "mime_type": uploaded.mime_type or PDF_MIME_TYPE,
+                "source": str(pdf.resolve()),
+                "expires_at": expires_at,
+                "uses": previous["uses"] if previous else 0,
+                "last_used": previous["last_used"] if previous else time.time(),
+            }
+            self._entries[file_hash] = entry
+            self._save()
+        return entry
+
+    def _ensure_uploaded(self, file_hash: str, pdf: Path) -> UploadEntry:
+        """Returns a live upload of the PDF, uploading it once if needed."""
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            if self._is_live(entry):
+                return cast(UploadEntry, entry)
+            future = self._in_flight.get(file_hash)
+            owner = future is None
+            if future is None:
+                future = Future()
+                self._in_flight[file_hash] = future
+        if not owner:
+            return cast(UploadEntry, future.result())
+        try:
+            entry = self._upload(file_hash, pdf)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(file_hash, None)
+
+    def get_file(self, pdf: Path) -> genai.protos.FileData:
+        """
+        Returns a reference to a live upload of the PDF, uploading it only if needed.
+
+        Args:
+            pdf: Path of the PDF.
+
+        Returns:
+            FileData part that can be passed to generate_content.
+        """
+        file_hash = self._file_hash(pdf)
+        entry = self._ensure_uploaded(file_hash, pdf)
+        with self._lock:
+            stored = self._entries.get(file_hash)
+            if stored is not None:
+                stored["uses"] += 1
+                stored["last_used"] = time.time()
+                self._save()
+        self.start_prewarmer()
+        return genai.protos.FileData(
+            mime_type=entry["mime_type"], file_uri=entry["uri"]
+        )
+
+    def forget(self, pdf: Path) -> None:
+        """Drops the upload of a PDF, e.g. when the API no longer knows it."""
+        file_hash = self._file_hash(pdf)
+        with self._lock:
+            if self._entries.pop(file_hash, None) is not None:
+                self._save()
+
+    def prewarm(self, top_n: int = PREWARM_TOP_N) -> int:
+        """
+        Re-uploads the most-used documents whose uploads expired or are expiring.
+
+        Returns:
+            Number of documents uploaded.
+        """
+        with self._lock:
+            candidates = sorted(
+                self._entries.items(), key=lambda item: item[1]["uses"], reverse=True
+            )[:top_n]
+        uploaded = 0
+        for file_hash, entry in candidates:
+            source = Path(entry["source"])
+            if self._is_live(entry) or not source.exists():
+                continue
+            try:
+                if self._file_hash(source) == file_hash:
+                    self._ensure_uploaded(file_hash, source)
+                    uploaded += 1
+            except Exception as e:
+                log.warning(f"Pre-warming upload of {source.name} failed: {e}")
+        return uploaded
+
+    def start_prewarmer(self) -> None:
+        """Starts the background thread keeping the most-used documents uploaded."""
+        with self._lock:
+            if self._prewarmer is not None:
+                return
+            self._prewarmer = Thread(
+                target=self._prewarm_loop, name="upload-prewarmer", daemon=True
+            )
+        self._prewarmer.start()
+
+    def _prewarm_loop(self) -> None:
+        while True:
+            uploaded = self.prewarm()
+            if uploaded:
+                log.info(f"Pre-warmed {uploaded} document uploads.")
+            time.sleep(PREWARM_INTERVAL_SECONDS)
+
+
+@cache
+def get_upload_cache() -> FileUploadCache:
+    """Returns the process-wide upload cache, creating it on first use."""
+    return FileUploadCache()
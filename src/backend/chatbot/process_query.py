@@ -1,5 +1,7 @@
+import hashlib
 import time
 import traceback
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any
 import logging
@@ -7,9 +9,19 @@ from chromadb.api.client import Client as ChromaClient
 
 import google.generativeai as genai  # type: ignore[unused-ignore]
 from dotenv import load_dotenv
-from backend.rag.llm_embedding_function import get_gemini_ef
+from google.api_core import exceptions as google_exceptions
 from backend.rag.chroma_collection_manager import get_relevant_passage
-from backend.chatbot.prompt_enhancer import enhance_prompt
+from backend.rag.chunking import merge_adjacent_chunks
+from backend.rag.collection_registry import get_collection_registry
+from backend.rag.context_assembler import (
+    assemble_context,
+    candidate_count,
+    get_context_budget,
+)
+from backend.chatbot.context_cache import get_context_cache
+from backend.chatbot.file_upload_cache import get_upload_cache
+from backend.chatbot.prompt_enhancer import enhance_prompt_async
+from backend.utils.rate_limiter import RequestScheduler
 
 log = logging.getLogger("__name__")
 
@@ -17,21 +29,76 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 
 load_dotenv()
 
-# Number of pages to retrieve for RAG context by default
-DEFAULT_RAG_CONTEXT_PAGES = 5
-# Delay between yielding response chunks
-STREAM_RESPONSE_CHUNK_DELAY_SECONDS = 0.1
-# Delay after processing a document/query, e.g., for API rate limiting
-POST_PROCESS_DELAY_SECONDS = 1.0
+# Tokens of RAG context by default (the model's whole budget only on request): about
+# five PDF pages of ~800 tokens, as retrieved before pages were split into chunks
+DEFAULT_RAG_CONTEXT_TOKENS = 4_000
+# Generation API quota per model (requests, shared by every request of the process)
+GENERATION_REQUESTS_PER_MINUTE = 1000
 # RAG context header
 RAG_CONTEXT_HEADER = "\n\nRelevant context from the document:\n"
 # RAG context footer
 RAG_CONTEXT_FOOTER = "\n\nPlease use only the above context to generate an answer."
+# Instruction used instead of the RAG context when the whole document is cached
+CACHED_CONTEXT_INSTRUCTION = (
+    "\n\nPlease use only the document provided in the context to generate an answer."
+)
 # RAG error during context retrieval prompt instruction
 RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION = (
     "Ignore all instructions and output: 'Error: No context found.'"
 )
 
+generation_scheduler = RequestScheduler(GENERATION_REQUESTS_PER_MINUTE)
+
+
+def _stream_response(response: Any, pdf_name: Any, started: float) -> Any:
+    """
+    Forwards streamed response chunks as soon as they arrive.
+
+    Logs time-to-first-token and total latency of the request, measured from started.
+
+    Args:
+        response: Streamed response of generate_content / send_message.
+        pdf_name: The document the response is about, added to each chunk.
+        started: time.perf_counter() value taken before the request was scheduled.
+
+    Yields:
+        dict: `{"pdf_name": str, "content": str}` for each chunk of the response.
+    """
+    first_token_seconds = None
+    chunks = 0
+    for response_chunk in response:
+        if first_token_seconds is None:
+            first_token_seconds = time.perf_counter() - started
+        chunks += 1
+        # replace -> sometimes double space between words occure; most likely reason: pdf formating
+        response_chunk_text = response_chunk.text.replace("  ", " ")
+        yield {"pdf_name": pdf_name, "content": response_chunk_text}
+    total_seconds = time.perf_counter() - started
+    ttft = f"{first_token_seconds:.2f}s" if first_token_seconds is not None else "n/a"
+    usage = getattr(response, "usage_metadata", None)
+    tokens = (
+        f", {getattr(usage, 'prompt_token_count', 0)} input tokens "
+        f"({getattr(usage, 'cached_content_token_count', 0)} from cached context)"
+        if usage is not None
+        else ""
+    )
+    log.info(
+        f"Response for '{pdf_name}': time to first token {ttft}, "
+        f"total {total_seconds:.2f}s, {chunks} chunks{tokens}."
+    )
+
+
+def _start_enhancement(
+    prompt: str,
+    model: genai.GenerativeModel,
+    enhancer_flag: str,
+    enhanced_prompt: Future | None,
+) -> Future | None:
+    """Starts prompt enhancement in the background unless it is off or already started."""
+    if enhancer_flag != "True" or enhanced_prompt is not None:
+        return enhanced_prompt
+    return enhance_prompt_async(prompt, model)
+
 
 def _build_final_llm_prompt(
     base_prompt: str,
@@ -42,6 +109,7 @@ def _build_final_llm_prompt(
     identifier: str,
     rag_context: str | None = None,
     chat_history: str | None = None,
+    enhanced_prompt: Future | None = None,
 ) -> str:
     """
     Enhances (optionally) and constructs the final prompt string for the LLM.
@@ -55,6 +123,8 @@ def _build_final_llm_prompt(
         identifier: A string identifier (like a PDF name/stem) for logging.
         rag_context: Optional RAG context string.
         chat_history: Optional string containing the chat history.
+        enhanced_prompt: Optional future of the enhanced prompt, started by the caller
+            so enhancement overlaps retrieval; started here if missing.
 
     Returns:
         The (potentially enhanced) and fully assembled prompt string for the LLM.
@@ -66,7 +136,9 @@ def _build_final_llm_prompt(
             log.debug(
                 f"Original prompt for '{identifier}': '{processed_prompt[:100]}...'"
             )
-            processed_prompt = enhance_prompt(processed_prompt, model)
+            if enhanced_prompt is None:
+                enhanced_prompt = enhance_prompt_async(processed_prompt, model)
+            processed_prompt = enhanced_prompt.result()
             log.debug(
                 f"Improved prompt for '{identifier}': '{processed_prompt[:100]}...'"
             )
@@ -100,18 +172,22 @@ def _get_rag_context(
     chroma_client: ChromaClient,
     collection_name: str,
     rag_doc_slider: str,
-    embedding_function: Any,
+    model_name: str | None = None,
 ) -> str:
     """
     Retrieves and formats the RAG context from ChromaDB.
 
+    The ranked passages are packed into the model's context token budget (see
+    context_assembler), so the context never exceeds it, whatever the document size.
+
     Args:
         prompt: The user's query to find relevant passages.
         pdf_name: The name/identifier of the PDF for logging.
         chroma_client: The ChromaDB client instance.
         collection_name: The name of the ChromaDB collection.
-        rag_doc_slider: String flag ("True" to use all chunks, "False" for default_n_pages).
-        embedding_function: The embedding function for the ChromaDB collection.
+        rag_doc_slider: String flag ("True" to fill the whole token budget with the
+                        best passages, "False" for DEFAULT_RAG_CONTEXT_TOKENS).
+        model_name: Name of the model the context is for, selects the token budget.
 
     Returns:
         A string containing the formatted RAG context, or an error instruction string
@@ -121,47 +197,42 @@ def _get_rag_context(
         log.debug(
             f"Attempting to retrieve RAG context for '{pdf_name}' with prompt: '{prompt}'"
         )
-        collection = chroma_client.get_collection(
-            name=collection_name, embedding_function=embedding_function
-        )
-
-        total_chunks_in_collection = collection.count()
-
-        if rag_doc_slider == "True":
-            n_results = total_chunks_in_collection
-            log.debug(
-                f"Using all {n_results} available document chunks for RAG context for '{pdf_name}'."
-            )
-        else:
-            n_results = DEFAULT_RAG_CONTEXT_PAGES
-            if (
-                n_results > total_chunks_in_collection
-                and total_chunks_in_collection > 0
-            ):
-                n_results = total_chunks_in_collection
-                log.debug(
-                    f"Default n_pages ({DEFAULT_RAG_CONTEXT_PAGES}) exceeds total "
-                    f"chunks in collection ({total_chunks_in_collection}). "
-                    f"Using {n_results} for '{pdf_name}'."
-                )
-            elif total_chunks_in_collection == 0:
-                log.warning(
-                    f"No documents found in collection '{collection_name}' for '{pdf_name}' "
-                    "RAG context will be empty."
-                )
-                return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
-            log.debug(
-                f"Using {n_results} document chunks for RAG context for '{pdf_name}'."
+        # handles, counts and vectors are cached per process, see collection_registry
+        registry = get_collection_registry()
+        collection = registry.get_collection(chroma_client, collection_name)
+
+        snapshot = registry.snapshot(chroma_client, collection_name)
+        total_chunks_in_collection = registry.count(chroma_client, collection_name)
+        budget_tokens = get_context_budget(model_name)
+        if rag_doc_slider != "True":
+            budget_tokens = min(budget_tokens, DEFAULT_RAG_CONTEXT_TOKENS)
+
+        if total_chunks_in_collection == 0:
+            log.warning(
+                f"No documents found in collection '{collection_name}' for '{pdf_name}' "
+                "RAG context will be empty."
             )
+            return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
+        # as many of the best chunks as fit in the token budget (chunks are a fraction
+        # of a page, see chunking), not all of them
+        n_results = candidate_count(snapshot.documents, budget_tokens)
+        log.debug(
+            f"Ranking {n_results} of {total_chunks_in_collection} document chunks "
+            f"for a {budget_tokens} token RAG context for '{pdf_name}'."
+        )
 
         if n_results == 0:
             log.warning(f"No document chunks to retrieve from RAG for '{pdf_name}'")
             return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
 
         passages_with_pages = get_relevant_passage(
-            prompt, collection, n_results=n_results
+            prompt,
+            collection,
+            n_results=n_results,
+            snapshot=snapshot,
+            keyword_index=registry.keyword_index(chroma_client, collection_name),
         )  # TODO: experiment with different n_results values
-        # always have an additional page: RAG often pulls table of contents if
+        # candidate_count over-fetches: RAG often pulls the table of contents if
         # avaliable in the document (which does not have any informational value)
         # not all documents contain it and if so, it is placed on different pages
         # no robust way to delete it without risk of losing data
@@ -171,23 +242,73 @@ def _get_rag_context(
             # Depending on desired behavior, could return error or just empty context
             return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
 
-        context_parts = [RAG_CONTEXT_HEADER]
-        for passage, page_number in passages_with_pages:
-            context_parts.append(f"Page {page_number}: {passage}\n")
-        context_parts.append(RAG_CONTEXT_FOOTER)
-
-        rag_context = "".join(context_parts)
-        log.debug(f"Successfully retrieved RAG context for '{pdf_name}'.")
-        return rag_context
+        assembled = assemble_context(
+            passages_with_pages,
+            budget_tokens,
+            header=RAG_CONTEXT_HEADER,
+            footer=RAG_CONTEXT_FOOTER,
+        )
+        if not assembled.passages:
+            log.warning(f"No passage of '{pdf_name}' fits in the token budget.")
+            return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
+        log.info(
+            f"RAG context for '{pdf_name}': {len(assembled.passages)} passages, "
+            f"~{assembled.tokens_used} of {budget_tokens} tokens "
+            f"({assembled.skipped} duplicate or over budget skipped)."
+        )
+        return assembled.text
 
     except Exception as e:
         log.error(
             f"Problem retrieving RAG context for '{pdf_name}'. Error: {e}\n",
             exc_info=True,
         )
+        # the cached handle may be stale, e.g. the collection was rebuilt
+        get_collection_registry().invalidate(chroma_client, collection_name)
         return RAG_CONTEXT_ERROR_PROMPT_INSTRUCTION
 
 
+def _cached_document_model(
+    model: genai.GenerativeModel,
+    chroma_client: ChromaClient,
+    collection_name: str,
+) -> genai.GenerativeModel | None:
+    """
+    Returns a model whose cached context holds every passage of a document.
+
+    Args:
+        model: The model the chat would otherwise use.
+        chroma_client: The ChromaDB client instance.
+        collection_name: Name of the document's collection.
+
+    Returns:
+        The model referencing the cached document, or None if caching is unavailable.
+    """
+    snapshot = get_collection_registry().snapshot(chroma_client, collection_name)
+    chunks = sorted(
+        (
+            (text, meta or {})
+            for text, meta in zip(snapshot.documents, snapshot.metadatas)
+        ),
+        key=lambda chunk: (
+            int(chunk[1].get("page_number", 0)),
+            chunk[1].get("char_start", 0),
+        ),
+    )
+    # overlapping chunks of a page are joined back into the page text
+    document = "".join(
+        f"Page {page_number}: {text}\n"
+        for text, page_number in merge_adjacent_chunks(chunks)
+    )
+    content_hash = hashlib.sha256(document.encode("utf-8")).hexdigest()
+    return get_context_cache().get_model(
+        model,
+        content_key=f"collection:{collection_name}:{content_hash}",
+        display_name=collection_name,
+        build_contents=lambda: [RAG_CONTEXT_HEADER + document],
+    )
+
+
 def process_pdf(
     prompt: str,
     pdf: Path,
@@ -196,11 +317,13 @@ def process_pdf(
     enhancer_checkbox: str,
     output_size: str,
     temperature_slider_value: float,
+    use_context_cache: bool = False,
 ) -> Any:
     """
     Uploads a PDF, processes it with a generative model, and streams content.
 
-    This function takes a PDF file and a prompt, uploads the file,
+    This function takes a PDF file and a prompt, uploads the file (reusing a live
+    upload of the same content, see file_upload_cache),
     and then calls the generative model to process the content based on
     the (potentially enhanced) prompt. It streams the model's response,
     yielding cleaned text chunks or an error dictionary.
@@ -215,6 +338,8 @@ def process_pdf(
                            prompt should be enhanced.
         output_size: The desired output size (e.g., number of words).
         temperature_slider_value: The temperature setting for model generation.
+        use_context_cache: Whether to keep the PDF in a provider-side cached context,
+                           so further questions about it do not send it again.
 
     Yields:
         dict: A dictionary for each chunk of the response or for an error.
@@ -226,10 +351,14 @@ def process_pdf(
         yield {"error": "No prompt provided"}
         return
 
+    file_to_send = None
     try:
         log.info(f"Document: {pdf.stem} is beeing analyzed.")
-        file_to_send = genai.upload_file(pdf)
-        log.debug(f"PDF uploaded successfully. File metadata: {file_to_send}\n")
+        started = time.perf_counter()
+        enhanced_prompt = _start_enhancement(prompt, model, enhancer_checkbox, None)
+        # live uploads are reused, a PDF is uploaded again only after it expired
+        file_to_send = get_upload_cache().get_file(pdf)
+        log.debug(f"PDF available in the Files API: {file_to_send.file_uri}\n")
 
         final_llm_prompt_for_model = _build_final_llm_prompt(
             base_prompt=prompt,
@@ -238,21 +367,40 @@ def process_pdf(
             enhancer_flag=enhancer_checkbox,
             model=model,
             identifier=pdf.stem,
+            enhanced_prompt=enhanced_prompt,
+        )
+        cached_model = (
+            get_context_cache().get_model(
+                model,
+                content_key=f"file:{file_to_send.file_uri}",
+                display_name=pdf.stem,
+                build_contents=lambda: [file_to_send],
+            )
+            if use_context_cache
+            else None
         )
-        response = model.generate_content(
-            [final_llm_prompt_for_model, file_to_send],
+        if cached_model is not None:
+            contents: list[Any] = [final_llm_prompt_for_model]
+        else:
+            cached_model, contents = model, [final_llm_prompt_for_model, file_to_send]
+        response = generation_scheduler.call(
+            model.model_name,
+            cached_model.generate_content,
+            contents,
             stream=True,
             generation_config={"temperature": temperature_slider_value},
         )
 
-        for response_chunk in response:
-            # replace -> sometimes double space between words occure; most likely reason: pdf formating
-            response_chunk_text = response_chunk.text.replace("  ", " ")
-            yield {"pdf_name": pdf, "content": response_chunk_text}
-            time.sleep(STREAM_RESPONSE_CHUNK_DELAY_SECONDS)
-        log.debug(f"Response for: {pdf} was saved!\n")
-        time.sleep(POST_PROCESS_DELAY_SECONDS)  # lower API request rate per sec
+        yield from _stream_response(response, pdf, started)
     except Exception as e:
+        if isinstance(
+            e, google_exceptions.NotFound | google_exceptions.PermissionDenied
+        ):
+            # the upload (or the cached context referencing it) was deleted before
+            # its expiry, create it again next time
+            if use_context_cache and file_to_send is not None:
+                get_context_cache().forget(model, f"file:{file_to_send.file_uri}")
+            get_upload_cache().forget(pdf)
         log.error(f"There is a problem with {pdf.stem}. \n Error message: {e}\n")
         traceback.print_exc()
         yield {"error": f"An error occurred while processing {pdf.stem}: {str(e)}"}
@@ -269,6 +417,7 @@ def process_query_with_rag(
     chroma_client: ChromaClient,
     collection_name: str,
     rag_doc_slider: str,
+    enhanced_prompt: Future | None = None,
 ) -> Any:
     """
     Processes a query using RAG, combining it with context from a document.
@@ -288,8 +437,11 @@ def process_query_with_rag(
         temperature_slider_value: Temperature for model generation.
         chroma_client: The ChromaDB client instance.
         collection_name: Name of the ChromaDB collection for this document.
-        rag_doc_slider: String flag ("True" to use all chunks from the document's
-                        collection, "False" for a default number).
+        rag_doc_slider: String flag ("True" to use the best chunks of the document
+                        up to the model's token budget, "False" for a default number).
+        enhanced_prompt: Optional future of the enhanced prompt shared by all documents
+                         of a request; when missing and enhancement is on, it is started
+                         here and runs while the context is retrieved.
 
     Yields:
         dict: A dictionary for each chunk of the response or for an error.
@@ -301,13 +453,16 @@ def process_query_with_rag(
         yield {"error": "No prompt provided"}
         return
 
+    enhanced_prompt = _start_enhancement(
+        prompt, model, enhancer_checkbox, enhanced_prompt
+    )
     rag_context = _get_rag_context(
         prompt=prompt,
         pdf_name=pdf_name,
         chroma_client=chroma_client,
         collection_name=collection_name,
         rag_doc_slider=rag_doc_slider,
-        embedding_function=get_gemini_ef(),
+        model_name=model.model_name,
     )
     log.debug(f"Context for {pdf_name}:\n{rag_context}\n")
 
@@ -319,21 +474,19 @@ def process_query_with_rag(
         model=model,
         identifier=pdf_name,
         rag_context=rag_context,
+        enhanced_prompt=enhanced_prompt,
     )
 
     try:
-        response = model.generate_content(
+        started = time.perf_counter()
+        response = generation_scheduler.call(
+            model.model_name,
+            model.generate_content,
             [final_llm_prompt],
             stream=True,
             generation_config={"temperature": temperature_slider_value},
         )
-        for response_chunk in response:
-            # replace -> sometimes double space between words occure; most likely reason: pdf formating
-            response_chunk_text = response_chunk.text.replace("  ", " ")
-            yield {"pdf_name": pdf_name, "content": response_chunk_text}
-            time.sleep(STREAM_RESPONSE_CHUNK_DELAY_SECONDS)
-        log.debug(f"Response for: {pdf_name} was saved!\n")
-        time.sleep(POST_PROCESS_DELAY_SECONDS)  # lower API request rate per sec
+        yield from _stream_response(response, pdf_name, started)
     except Exception as e:
         log.error(f"There is a problem with {pdf_name}. \n Error message: {e}\n")
         traceback.print_exc()
@@ -352,6 +505,8 @@ def process_chat_query_with_rag(
     chroma_client: ChromaClient,
     collection_name: str,
     rag_doc_slider: str,
+    enhanced_prompt: Future | None = None,
+    use_context_cache: bool = False,
 ) -> Any:
     """
     Processes a chat query using RAG, incorporating conversation history.
@@ -373,8 +528,14 @@ def process_chat_query_with_rag(
         temperature_slider_value: Temperature for model generation.
         chroma_client: The ChromaDB client instance.
         collection_name: Name of the ChromaDB collection for this document.
-        rag_doc_slider: String flag ("True" to use all chunks from the document's
-                        collection, "False" for a default number).
+        rag_doc_slider: String flag ("True" to use the best chunks of the document
+                        up to the model's token budget, "False" for a default number).
+        enhanced_prompt: Optional future of the enhanced prompt shared by all documents
+                         of a request; when missing and enhancement is on, it is started
+                         here and runs while the context is retrieved.
+        use_context_cache: Whether to keep the whole document in a provider-side cached
+                           context, so each turn sends only the question and history.
+                           Falls back to RAG retrieval when caching is unavailable.
 
     Yields:
         dict: A dictionary for each chunk of the response or for an error.
@@ -386,14 +547,27 @@ def process_chat_query_with_rag(
         yield {"error": "No prompt provided"}
         return
 
-    rag_context = _get_rag_context(
-        prompt=prompt,
-        pdf_name=pdf_name,
-        chroma_client=chroma_client,
-        collection_name=collection_name,
-        rag_doc_slider=rag_doc_slider,
-        embedding_function=get_gemini_ef(),
+    enhanced_prompt = _start_enhancement(
+        prompt, model, enhancer_checkbox, enhanced_prompt
     )
+    chat_model = None
+    if use_context_cache:
+        try:
+            chat_model = _cached_document_model(model, chroma_client, collection_name)
+        except Exception as e:
+            log.warning(f"Cached context for '{pdf_name}' unavailable: {e}")
+    if chat_model is not None:
+        rag_context = CACHED_CONTEXT_INSTRUCTION
+    else:
+        chat_model = model
+        rag_context = _get_rag_context(
+            prompt=prompt,
+            pdf_name=pdf_name,
+            chroma_client=chroma_client,
+            collection_name=collection_name,
+            rag_doc_slider=rag_doc_slider,
+            model_name=model.model_name,
+        )
     log.debug(f"Context for {pdf_name} (chat query):\n{rag_context}\n")
 
     final_llm_prompt = _build_final_llm_prompt(
@@ -404,6 +578,7 @@ def process_chat_query_with_rag(
         model=model,
         identifier=pdf_name,
         rag_context=rag_context,
+        enhanced_prompt=enhanced_prompt,
         chat_history=chat_history,
     )
 
@@ -412,8 +587,11 @@ def process_chat_query_with_rag(
             f"Generating chat response for query on '{pdf_name}' with prompt: "
             f"'{final_llm_prompt[:200]}...'"
         )
-        chat = model.start_chat(history=chat_history)  # type: ignore[arg-type]
-        response = chat.send_message(
+        started = time.perf_counter()
+        chat = chat_model.start_chat(history=chat_history)  # type: ignore[arg-type]
+        response = generation_scheduler.call(
+            model.model_name,
+            chat.send_message,
             [final_llm_prompt],
             stream=True,
             generation_config=genai.types.GenerationConfig(
@@ -421,13 +599,7 @@ def process_chat_query_with_rag(
             ),
         )
 
-        for response_chunk in response:
-            # replace -> sometimes double space between words occure; most likely reason: pdf formating
-            response_chunk_text = response_chunk.text.replace("  ", " ")
-            yield {"pdf_name": pdf_name, "content": response_chunk_text}
-            time.sleep(STREAM_RESPONSE_CHUNK_DELAY_SECONDS)
-        log.debug(f"Response for: {pdf_name} was saved!\n")
-        time.sleep(POST_PROCESS_DELAY_SECONDS)  # lower API request rate per sec
+        yield from _stream_response(response, pdf_name, started)
     except Exception as e:
         log.error(f"There is a problem with {pdf_name}. \n Error message: {e}\n")
         traceback.print_exc()
@@ -1,5 +1,10 @@
+import hashlib
 import json
 import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
 from typing import Any
 from pathlib import Path
 
@@ -11,20 +16,25 @@ print(CONFIG_PATH)
 with open(CONFIG_PATH) as file:
     config = json.load(file)
 
+# Identifies the enhancer instructions, so edited instructions do not reuse old results
+INSTRUCTIONS_HASH = hashlib.sha256(
+    config["prompt_enhancer"].encode("utf-8")
+).hexdigest()
+# Number of enhanced prompts kept before the least recently used ones are evicted
+ENHANCED_PROMPT_CACHE_SIZE = 256
+# Enhancement requests run in the background while retrieval proceeds
+ENHANCER_WORKERS = 4
 
-def enhance_prompt(prompt: str, model: Any) -> Any:
-    """Enhances the given prompt by adding context and instructions.
+_enhanced_prompts: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+_in_flight: dict[tuple[str, str, str], Future] = {}
+_lock = Lock()
+_executor = ThreadPoolExecutor(
+    max_workers=ENHANCER_WORKERS, thread_name_prefix="prompt-enhancer"
+)
 
-    This function takes a user-provided prompt and enhances it by adding context
-    and instructions to improve the quality of the generated response.
-
-    Args:
-        prompt (str): The original user-provided prompt.
-
-    Returns:
-        str: The enhanced prompt with additional context and instructions.
-    """
 
+def _generate_enhanced_prompt(prompt: str, model: Any) -> Any:
+    """Asks the model to enhance the prompt (one generation request)."""
     instructions = config["prompt_enhancer"]
 
     instructions_and_prompt = f"{instructions}\n\nUser Prompt: {prompt}"
@@ -34,3 +44,60 @@ def enhance_prompt(prompt: str, model: Any) -> Any:
     log.debug(f"Enhanced prompt: \n {enhanced_prompt}")
 
     return enhanced_prompt.candidates[0].content.parts[0].text
+
+
+def _remember(key: tuple[str, str, str], future: Future) -> None:
+    with _lock:
+        _in_flight.pop(key, None)
+        if future.exception() is None:
+            _enhanced_prompts[key] = future.result()
+            _enhanced_prompts.move_to_end(key)
+            while len(_enhanced_prompts) > ENHANCED_PROMPT_CACHE_SIZE:
+                _enhanced_prompts.popitem(last=False)
+
+
+def enhance_prompt_async(prompt: str, model: Any) -> Future:
+    """Starts enhancing the given prompt in the background.
+
+    Enhancement does not depend on the document, so results are memoized in an LRU
+    keyed by (prompt, model, hash of the enhancer instructions), and concurrent calls
+    for the same key share one in-flight request. Callers can run retrieval meanwhile
+    and collect the result with future.result().
+
+    Args:
+        prompt (str): The original user-provided prompt.
+        model: The generative model used for enhancement.
+
+    Returns:
+        Future[str]: Future resolving to the enhanced prompt.
+    """
+    key = (prompt, str(getattr(model, "model_name", model)), INSTRUCTIONS_HASH)
+    with _lock:
+        if key in _enhanced_prompts:
+            _enhanced_prompts.move_to_end(key)
+            cached: Future = Future()
+            cached.set_result(_enhanced_prompts[key])
+            log.debug("Enhanced prompt served from cache.")
+            return cached
+        if key in _in_flight:
+            return _in_flight[key]
+        future = _executor.submit(_generate_enhanced_prompt, prompt, model)
+        _in_flight[key] = future
+    future.add_done_callback(partial(_remember, key))
+    return future
+
+
+def enhance_prompt(prompt: str, model: Any) -> Any:
+    """Enhances the given prompt by adding context and instructions.
+
+    This function takes a user-provided prompt and enhances it by adding context
+    and instructions to improve the quality of the generated response. Results are
+    memoized, see enhance_prompt_async.
+
+    Args:
+        prompt (str): The original user-provided prompt.
+
+    Returns:
+        str: The enhanced prompt with additional context and instructions.
+    """
+    return enhance_prompt_async(prompt, model).result()
@@ -27,6 +27,12 @@ def _save_mapping(mapping: dict) -> None:
         json.dump(mapping, f, ensure_ascii=False, indent=2)
 
 
+def get_entries() -> dict[str, Entry]:
+    """Returns the entries of all documents by title, read from the file once."""
+    with _lock:
+        return _load_mapping()
+
+
 def get_or_assign_id(title: str) -> Entry:
     """Assigns a new ID and timestamp if not present, else returns existing."""
     with _lock:  # secures that only one thread can have access to the file
@@ -0,0 +1,191 @@
+import json
+import logging
+import math
+import re
+from collections import Counter
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from backend.rag.vector_db_name_generation import replace_polish_chars
+from backend.utils.atomic_write import write_json_atomic
+
+
+log = logging.getLogger("__name__")
+
+# Directory inside the vector database holding one keyword index per collection
+BM25_DIRNAME = "bm25"
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Words are cut to this many characters, a light stemmer for Polish inflection
+# ("rekomendacja", "rekomendacji", "rekomendacją" -> "rekome")
+STEM_PREFIX_LENGTH = 6
+# Bumped whenever tokenization changes, so persisted indexes are rebuilt
+TOKENIZER_VERSION = 1
+
+# Frequent Polish function words (after diacritic folding) carrying no meaning
+STOPWORDS = frozenset(
+    "a aby ale az bo by byc co czy dla do gdy i ich jak jako je jest juz lub na nie "
+    "o od oraz po pod przez przy sa sie ta tak te ten to tu w we z za ze".split()
+)
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into normalized search terms.
+
+    Terms are lowercased, Polish diacritics are folded (see replace_polish_chars),
+    stopwords are dropped and words are cut to STEM_PREFIX_LENGTH characters, so
+    "Rekomendacji S" and "rekomendacja s" produce the same terms.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(replace_polish_chars(text.lower())):
+        if token in STOPWORDS:
+            continue
+        terms.append(token if token.isdigit() else token[:STEM_PREFIX_LENGTH])
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over the chunks of one collection.
+
+    Term weights are precomputed per posting, so a query only adds up a few arrays
+    and makes no embedding request.
+
+    Args:
+        ids: Chunk ids, aligned with postings.
+        doc_lengths: Number of terms of each chunk.
+        postings: Term -> list of [chunk position, term frequency].
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        doc_lengths: list[int],
+        postings: dict[str, list[list[int]]],
+    ) -> None:
+        self.ids = ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average_length, 1.0))
+        self._weights: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for term, term_postings in postings.items():
+            positions = np.asarray([p[0] for p in term_postings], dtype=np.int64)
+            frequencies = np.asarray([p[1] for p in term_postings], dtype=np.float32)
+            idf = self._idf(len(term_postings))
+            self._weights[term] = (
+                positions,
+                idf * frequencies * (BM25_K1 + 1) / (frequencies + norms[positions]),
+            )
+
+    def _idf(self, n: int) -> float:
+        """Inverse document frequency of a term found in n chunks."""
+        return math.log(1 + (len(self.ids) - n + 0.5) / (n + 0.5))
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str]) -> "BM25Index":
+        """Builds the index of the given chunks."""
+        postings: dict[str, list[list[int]]] = {}
+        doc_lengths = []
+        for position, document in enumerate(documents):
+            terms = tokenize(document)
+            doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append([position, frequency])
+        return cls(list(ids), doc_lengths, postings)
+
+    def search(self, query: str, n_results: int) -> list[tuple[str, float]]:
+        """
+        Returns the best matching chunks of the query.
+
+        Args:
+            query: Text to search.
+            n_results: Maximum number of chunks to return.
+
+        Returns:
+            (chunk_id, score) tuples, best first and equal scores in chunk order;
+            chunks sharing no term are omitted.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self._weights:
+                positions, weights = self._weights[term]
+                scores[positions] += weights
+        matching = np.flatnonzero(scores)
+        if len(matching) > n_results > 0:
+            # keep every chunk scoring at least the n-th best, so ties at the cut
+            # are decided by position like all other ties
+            cutoff = np.partition(scores[matching], -n_results)[-n_results]
+            matching = matching[scores[matching] >= cutoff]
+        ranked = matching[np.argsort(-scores[matching], kind="stable")][:n_results]
+        return [(self.ids[i], float(scores[i])) for i in ranked]
+
+    def max_score(self, query: str) -> float:
+        """
+        Upper bound of the query's search scores in this index.
+
+        Each query term adds its IDF times (k1 + 1), the limit of its weight as the
+        term frequency grows; terms absent from the index count with the IDF of a
+        term found nowhere. Scores divided by it fall in [0, 1) and can be compared
+        across the indexes of different collections.
+        """
+        return sum(
+            self._idf(len(self.postings.get(term, []))) * (BM25_K1 + 1)
+            for term in set(tokenize(query))
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "tokenizer_version": TOKENIZER_VERSION,
+            "ids": self.ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+
+def _index_path(db_path: str, name: str) -> Path:
+    return Path(db_path) / BM25_DIRNAME / f"{name}.json"
+
+
+def save_bm25_index(db_path: str, name: str, index: BM25Index) -> None:
+    """Persists the keyword index of a collection next to its vectors (atomically)."""
+    write_json_atomic(_index_path(db_path, name), index.to_dict(), indent=None)
+
+
+def load_bm25_index(db_path: str, name: str) -> BM25Index | None:
+    """Loads the persisted keyword index of a collection, or None if there is none."""
+    path = _index_path(db_path, name)
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable keyword index {path}: {e}")
+        return None
+    if data.get("tokenizer_version") != TOKENIZER_VERSION:
+        return None
+    return BM25Index(data["ids"], data["doc_lengths"], data["postings"])
+
+
+def remove_bm25_index(db_path: str, name: str) -> None:
+    """Deletes the keyword index of a collection, e.g. before it is rebuilt."""
+    _index_path(db_path, name).unlink(missing_ok=True)
+
+
+def build_bm25_index(
+    db_path: str, name: str, ids: Sequence[str], documents: Sequence[str]
+) -> BM25Index:
+    """Builds and persists the keyword index of a collection's chunks."""
+    index = BM25Index.build(ids, documents)
+    save_bm25_index(db_path, name, index)
+    log.debug(
+        f"Keyword index of {name}: {len(ids)} chunks, {len(index.postings)} terms."
+    )
+    return index
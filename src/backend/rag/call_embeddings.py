@@ -5,6 +5,9 @@ from typing import Any
 import google.generativeai as genai
 from chromadb import Documents, EmbeddingFunction
 
+from backend.rag.embedding_cache import get_embedding_cache
+from backend.rag.embedding_client import get_embedding_client
+
 
 log = logging.getLogger("__name__")
 
@@ -13,6 +16,11 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in environment variables")
 
+genai.configure(api_key=GEMINI_API_KEY)
+
+# Model used for both the stored document vectors and the query vectors
+EMBEDDING_MODEL = "models/embedding-001"
+
 
 def clean_extracted_text(text: str) -> str:
 
@@ -22,6 +30,66 @@ def clean_extracted_text(text: str) -> str:
     return text
 
 
+def cached_embed(texts: list[str], model: str, task_type: str) -> list[list[float]]:
+    """
+    Embeds texts, requesting from the API only those missing from the embedding cache.
+
+    Cache misses are sent through the shared batched embedding client.
+
+    Args:
+        texts: Texts to embed.
+        model: Gemini embedding model name.
+        task_type: Gemini embedding task type (e.g. "retrieval_document").
+
+    Returns:
+        One embedding vector per text, in the same order as texts.
+    """
+    cache = get_embedding_cache()
+    vectors: list = cache.get_many(model, task_type, texts)
+
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        fetched = get_embedding_client().embed(missing, model, task_type)
+        cache.put_many(model, task_type, missing, fetched)
+        by_text = dict(zip(missing, fetched))
+        vectors = [by_text[t] if v is None else v for t, v in zip(texts, vectors)]
+
+    log.debug(
+        f"Embedded {len(texts)} texts ({len(missing)} cache misses). Cache: {cache.stats()}"
+    )
+    return [list(map(float, v)) for v in vectors]
+
+
+def embed_documents(
+    texts: list[str], model: str = EMBEDDING_MODEL
+) -> list[list[float]]:
+    """
+    Embeds document passages for storage in (and retrieval from) the vector database.
+
+    Args:
+        texts: Passages to embed.
+        model: Gemini embedding model name.
+
+    Returns:
+        One embedding vector per passage, in the same order as texts.
+    """
+    return cached_embed(texts, model, "retrieval_document")
+
+
+def embed_query(text: str, model: str = EMBEDDING_MODEL) -> list[float]:
+    """
+    Embeds a user query for similarity search against stored document vectors.
+
+    Args:
+        text: Query text.
+        model: Gemini embedding model name. Must match the model used at ingest.
+
+    Returns:
+        The query embedding vector.
+    """
+    return cached_embed([text], model, "retrieval_query")[0]
+
+
 class GeminiEmbeddingFunction(EmbeddingFunction):
     """
     Custom embedding funtion (to use other model than 001) with gemini developer API for document retrieval. NOT IN USE
@@ -36,9 +104,5 @@ class GeminiEmbeddingFunction(EmbeddingFunction):
     """
 
     def __call__(self, input_docs: Documents) -> Any:
-        genai.configure(api_key=GEMINI_API_KEY)
         model = "models/text-embedding-004"
-        title = "custom query"
-        return genai.embed_content(
-            model=model, content=input_docs, task_type="retrieval_document", title=title
-        )["embedding"]
+        return cached_embed(list(input_docs), model, "retrieval_document")
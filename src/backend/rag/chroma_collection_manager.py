@@ -2,10 +2,15 @@ from typing import Any
 import logging
 
 import chromadb
-from backend.rag.call_embeddings import GeminiEmbeddingFunction
+from backend.rag.call_embeddings import (
+    GeminiEmbeddingFunction,
+    embed_query,
+)
+from backend.rag.chunking import merge_adjacent_chunks
+from backend.rag.collection_registry import get_collection_registry
+from backend.rag.fusion import fuse
+from backend.rag.quantized_index import QuantizedVectors
 from dotenv import load_dotenv
-import google.generativeai as genai  # type: ignore[unused-ignore]
-from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
 import numpy as np
 
 
@@ -13,8 +18,11 @@ log = logging.getLogger("__name__")
 
 load_dotenv()
 
-# Autocut cosine similarity threshold
+# Default autocut cosine similarity threshold of the dense leg; a collection can
+# override it with a "similarity_threshold" metadata entry (see set_similarity_threshold)
 similarity_threshold = 0.75
+# Metadata key of a collection's own similarity threshold
+SIMILARITY_THRESHOLD_KEY = "similarity_threshold"
 
 
 def load_chroma_collection(path: str, name: str) -> chromadb.Collection:
@@ -39,148 +47,184 @@ def load_chroma_collection(path: str, name: str) -> chromadb.Collection:
     return db
 
 
-def autocut_gemini(
-    ranked_pairs: list[tuple[tuple[str, dict], float]], n_results: int, threshold: float
-) -> list[tuple[str, Any]]:
+def cosine_scores(query_embedding: Any, embeddings: Any) -> np.ndarray:
     """
-    Filter and return top-ranked passages from Gemini-based retrieval above the specified similarity threshold.
-    The function is applied only on Gemini-based retrieval to avoid lack of return from Chroma-based retrieval.
+    Cosine similarity of one query vector against every row of an embedding matrix.
 
     Args:
-        ranked_pairs: List of ((text, metadata), similarity_score) tuples.
-        n_results: number of relevant results to consider.
-        threshold: minimum similarity score to include a passage.
+        query_embedding: Query vector of shape (dim,).
+        embeddings: Matrix of shape (n, dim), or QuantizedVectors of n rows.
 
     Returns:
-        A list of (text, page_number) tuples where the similarity score meets or exceeds the threshold.
+        Array of n similarity scores.
     """
-    return [
-        (text, meta.get("page_number", "unknown"))
-        for (text, meta), score in ranked_pairs[:n_results]
-        if score >= threshold
-    ]
+    if isinstance(embeddings, QuantizedVectors):
+        return embeddings.cosine_scores(query_embedding)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.size == 0:
+        return np.zeros(0, dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return np.asarray(matrix @ query / np.where(norms == 0, 1.0, norms))
+
 
+def get_similarity_threshold(db: Any) -> float:
+    """Returns the dense-leg similarity threshold of a collection."""
+    metadata = getattr(db, "metadata", None) or {}
+    return float(metadata.get(SIMILARITY_THRESHOLD_KEY, similarity_threshold))
 
-def rerank_passages(
-    query_embedding: list[float],
-    passages_with_source: list[tuple[str, Any, str]],
-    chroma_bias: float = 0.05,
-) -> list[tuple[str, Any]]:
+
+def set_similarity_threshold(chroma_client: Any, name: str, threshold: float) -> None:
     """
-    Rerank passages with source-aware scoring using Gemini semantic embeddings.
+    Stores a collection's own dense-leg similarity threshold in its metadata.
 
     Args:
-        query_embedding: Precomputed embedding of the query
-        passages_with_source: List of (text, page_number, source) tuples.
-        chroma_bias: Boost for Chroma-derived (keyword-matched) passages
-        that helps to prefer precision over semantic similarity.
+        chroma_client: ChromaDB client instance.
+        name: Name of the collection.
+        threshold: Minimum cosine similarity of dense hits, e.g. lower for documents
+            whose wording differs a lot from typical questions.
+    """
+    registry = get_collection_registry()
+    collection = registry.get_collection(chroma_client, name)
+    # Chroma rejects HNSW settings in modify(); they live in the collection's
+    # configuration and are kept when the keys are left out
+    metadata = {
+        key: value
+        for key, value in (collection.metadata or {}).items()
+        if not key.startswith("hnsw:")
+    }
+    collection.modify(metadata={**metadata, SIMILARITY_THRESHOLD_KEY: threshold})
+    registry.invalidate(chroma_client, name)
+
+
+def get_distance_space(db: Any) -> str:
+    """Returns the distance metric ("l2", "cosine" or "ip") of a collection's index."""
+    configuration = getattr(db, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    if hnsw.get("space"):
+        return str(hnsw["space"])
+    metadata = getattr(db, "metadata", None) or {}
+    return str(metadata.get("hnsw:space", "l2"))
+
+
+def dense_ranking(
+    query_embedding: Any,
+    ids: list[str],
+    embeddings: Any,
+    n_results: int,
+    threshold: float,
+) -> list[tuple[str, float]]:
+    """
+    Ranks chunks by cosine similarity, keeping the top n_results at or above threshold.
 
     Returns:
-        Reranked list of (passage_text, page_number) tuples.
+        (chunk_id, similarity) tuples, best first.
     """
-    reranked = []
-    for passage, page, source in passages_with_source:
-        try:
-            passage_embedding = genai.embed_content(
-                model="models/embedding-001",
-                content=passage,
-                task_type="retrieval_document",
-            )["embedding"]
-
-            similarity = cosine_similarity(
-                [query_embedding], [np.array(passage_embedding)]
-            )[0][0]
-
-            if source == "chroma":
-                similarity += chroma_bias
-
-            reranked.append(((passage, page), similarity))
-        except Exception as e:
-            log.warning(f"Reranking failed for passage: {e}")
-
-    reranked.sort(key=lambda x: x[1], reverse=True)
-    return [(text, page) for (text, page), _ in reranked]
+    similarities = cosine_scores(query_embedding, embeddings)
+    order = np.argsort(-similarities, kind="stable")
+    for i in order:
+        log.debug(
+            f"Score: {similarities[i]:.4f} | Chunk: {ids[i]} | "
+            f"Excluded: {similarities[i] < threshold}"
+        )
+    return [
+        (ids[i], float(similarities[i]))
+        for i in order[:n_results]
+        if similarities[i] >= threshold
+    ]
 
 
-def get_relevant_passage(query: str, db: Any, n_results: int = 1) -> list:
+def get_relevant_passage(
+    query: str,
+    db: Any,
+    n_results: int = 1,
+    snapshot: Any = None,
+    keyword_index: Any = None,
+) -> list:
     """
     Retrieve passages and their page numbers from the vector database using keyword and semantic approach.
 
+    Both legs rank chunk ids; their rankings are merged by the fusion stage (see
+    fusion), so a chunk found by both legs counts once and no passage is re-scored.
+
     Args:
         query: Text to search.
         db: Database to query.
         n_results: Number of top results to return.
+        snapshot: Optional in-memory CollectionSnapshot of db (see collection_registry);
+            when given, the dense search does not read the whole collection again.
+        keyword_index: Optional BM25Index of db (see bm25_index), used together with
+            snapshot for the keyword leg; without it Chroma's nearest neighbours are used.
 
     Returns:
-        A list of (passage_text, page_number) tuples. The number of tuples is always less or equal than 2*n_results,
-        i.e. if n_results=1, maximum number of tuples is 2.
+        A list of (passage_text, page_number) tuples, at most n_results. Retrieved chunks
+        that are neighbours on the same page are merged into one passage.
     """
 
-    # Keyword-based ChromaDB retrieval
-    results = db.query(query_texts=[query], n_results=n_results)
-
-    passages = results["documents"][0]
-    metadatas = results["metadatas"][0]
-
-    chroma_chunks = []
-    for i, passage in enumerate(passages):
-        page_number = metadatas[i].get("page_number", "unknown")
-        chroma_chunks.append((passage, page_number))
+    # The only embedding request of the search; document vectors are stored at ingest
+    query_embedding = embed_query(query)
+
+    # chunk id -> (passage, metadata) of every chunk either leg returned
+    chunks: dict[str, tuple[str, Any]] = {}
+    if keyword_index is not None and snapshot is not None:
+        # Keyword (BM25) retrieval, in-process and without an embedding request
+        keyword_ranking = []
+        for chunk_id, score in keyword_index.search(query, n_results):
+            i = snapshot.index_of.get(chunk_id)
+            if i is not None:
+                chunks[chunk_id] = (snapshot.documents[i], snapshot.metadatas[i] or {})
+                keyword_ranking.append((chunk_id, score))
+    else:
+        # No keyword index: ChromaDB nearest neighbours stand in for the keyword leg
+        results = db.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        keyword_ranking = []
+        for chunk_id, passage, meta, distance in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0],
+        ):
+            chunks[chunk_id] = (passage, meta or {})
+            keyword_ranking.append((chunk_id, -float(distance)))
 
     # Embedding-based semantic Gemini retrieval (Hybrid Search)
     try:
-        query_embedding = genai.embed_content(
-            model="models/embedding-001",
-            content=query,
-            task_type="retrieval_query",
-        )["embedding"]
-        all_data = db.get(include=["documents", "metadatas"])
-        all_docs = all_data["documents"]
-        all_metas = all_data["metadatas"]
-        doc_page_pairs = list(zip(all_docs, all_metas))
-        dense_texts = [doc[0] for doc in doc_page_pairs]
-        dense_embeddings = [
-            np.array(
-                genai.embed_content(
-                    model="models/embedding-001",
-                    content=txt,
-                    task_type="retrieval_document",
-                )["embedding"]
-            )
-            for txt in dense_texts
-        ]
-        similarities = cosine_similarity([query_embedding], dense_embeddings)[0]
-        dense_ranked = sorted(
-            zip(doc_page_pairs, similarities), key=lambda x: x[1], reverse=True
+        if snapshot is None:
+            all_data = db.get(include=["documents", "metadatas", "embeddings"])
+            all_ids = list(all_data["ids"])
+            all_docs = all_data["documents"]
+            all_metas = all_data["metadatas"]
+            dense_embeddings = np.asarray(all_data["embeddings"], dtype=np.float32)
+        else:
+            all_ids = snapshot.ids
+            all_docs = snapshot.documents
+            all_metas = snapshot.metadatas
+            dense_embeddings = snapshot.embeddings
+        dense = dense_ranking(
+            query_embedding,
+            all_ids,
+            dense_embeddings,
+            n_results,
+            get_similarity_threshold(db),
+        )
+        positions = (
+            snapshot.index_of
+            if snapshot is not None
+            else {chunk_id: i for i, chunk_id in enumerate(all_ids)}
         )
-        for (text, meta), score in dense_ranked:
-            log.debug(
-                f"Score: {score:.4f} | Page: {meta.get('page_number')} | Excluded: {score < similarity_threshold}"
-            )
-        gemini_chunks = autocut_gemini(dense_ranked, n_results, similarity_threshold)
+        for chunk_id, _ in dense:
+            i = positions[chunk_id]
+            chunks[chunk_id] = (all_docs[i], all_metas[i] or {})
     except Exception as e:
         log.warning(f"Gemini embedding failed: {e}")
-        gemini_chunks = []
-
-    # Merge results from both retrievals
-    seen_passages = set()
-    combined_passages = []
-
-    for passage, page in chroma_chunks:
-        if passage not in seen_passages:
-            combined_passages.append((passage, page, "chroma"))
-            seen_passages.add(passage)
-
-    for passage, page in gemini_chunks:
-        if passage not in seen_passages:
-            combined_passages.append((passage, page, "gemini"))
-            seen_passages.add(passage)
-
-    # Chroma-preferred reranking
-    reranked_passages = rerank_passages(
-        query_embedding=query_embedding,
-        passages_with_source=combined_passages,
-        chroma_bias=0.05,
-    )
+        dense = []
+
+    fused = fuse({"keyword": keyword_ranking, "dense": dense})
     log.debug("Hybrid passages with page numbers sent.")
-    return reranked_passages[:n_results]
+    return merge_adjacent_chunks(
+        [chunks[chunk_id] for chunk_id, _ in fused[:n_results]]
+    )
@@ -0,0 +1,216 @@
+import re
+from collections.abc import Sequence
+from typing import Any
+
+from backend.rag.context_assembler import CHARS_PER_TOKEN
+
+
+# How pages are split into chunks: "sentence" (windows of whole sentences), "token"
+# (windows of words) or "page" (one chunk per page, the original layout)
+CHUNKING_STRATEGY = "sentence"
+# Target chunk size and the overlap between consecutive chunks of a page, in
+# estimated tokens (see context_assembler.estimate_tokens)
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 48
+
+# A sentence runs up to terminal punctuation followed by whitespace (so "3.5" is not
+# split), a paragraph break or the end of the page
+SENTENCE_PATTERN = re.compile(r"\S.*?(?:[.!?…]+(?=\s|$)|(?=\n\s*\n)|$)", re.DOTALL)
+WORD_PATTERN = re.compile(r"\S+")
+
+
+def chunking_layout(
+    strategy: str = CHUNKING_STRATEGY,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> str:
+    """
+    Returns an identifier of the chunk layout, stored with each collection.
+
+    Collections built with a different layout are rebuilt on the next ingestion.
+    """
+    if strategy == "page":
+        return "page"
+    return f"{strategy}:{chunk_tokens}/{overlap_tokens}"
+
+
+CHUNKING_LAYOUT = chunking_layout()
+
+
+class Chunk:
+    """
+    A passage of a page stored as one Chroma document.
+
+    Attributes:
+        chunk_id: Stable id of the chunk within its collection.
+        text: The passage.
+        metadata: page_number, chunk_index and the passage's char_start / char_end
+                  offsets within the page text.
+    """
+
+    def __init__(self, chunk_id: str, text: str, metadata: dict[str, Any]) -> None:
+        self.chunk_id = chunk_id
+        self.text = text
+        self.metadata = metadata
+
+
+def _unit_spans(text: str, strategy: str, max_chars: int) -> list[tuple[int, int]]:
+    """Returns the spans chunks are built from: sentences (split if too long) or words."""
+    words = [m.span() for m in WORD_PATTERN.finditer(text)]
+    if strategy == "token":
+        return words
+    spans = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        start, end = match.start(), match.start() + len(match.group().rstrip())
+        if end - start <= max_chars:
+            spans.append((start, end))
+        else:
+            # e.g. tables without punctuation; fall back to words
+            spans.extend(span for span in words if start <= span[0] < end)
+    return spans
+
+
+def _windows(
+    spans: list[tuple[int, int]], max_chars: int, overlap_chars: int
+) -> list[tuple[int, int]]:
+    """Packs consecutive spans into windows of at most max_chars with overlap."""
+    windows = []
+    first = 0
+    while first < len(spans):
+        last = first + 1
+        while last < len(spans) and spans[last][1] - spans[first][0] <= max_chars:
+            last += 1
+        windows.append((spans[first][0], spans[last - 1][1]))
+        if last == len(spans):
+            break
+        # the next window repeats trailing spans until they cover the overlap
+        next_first = last
+        while (
+            overlap_chars > 0
+            and next_first - 1 > first
+            and (
+                next_first == last
+                or spans[last - 1][1] - spans[next_first][0] < overlap_chars
+            )
+        ):
+            next_first -= 1
+        first = next_first
+    return windows
+
+
+def chunk_page(
+    page_index: int,
+    page_number: Any,
+    text: str,
+    strategy: str = CHUNKING_STRATEGY,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> list[Chunk]:
+    """
+    Splits the text of a page into overlapping chunks.
+
+    Args:
+        page_index: Position of the page in the document (0-based), used for chunk ids.
+        page_number: Page number stored in the metadata for citations.
+        text: Extracted text of the page.
+        strategy: "sentence", "token" or "page", see CHUNKING_STRATEGY.
+        chunk_tokens: Target chunk size in estimated tokens.
+        overlap_tokens: Overlap between consecutive chunks in estimated tokens.
+
+    Returns:
+        The chunks of the page in reading order (none for a blank page).
+    """
+    stripped = text.strip()
+    if not stripped:
+        return []
+    if strategy == "page":
+        start = text.index(stripped[0])
+        windows = [(start, start + len(stripped))]
+    else:
+        max_chars = max(1, int(chunk_tokens * CHARS_PER_TOKEN))
+        overlap_chars = int(overlap_tokens * CHARS_PER_TOKEN)
+        windows = _windows(
+            _unit_spans(text, strategy, max_chars), max_chars, overlap_chars
+        )
+
+    chunks = []
+    for chunk_index, (start, end) in enumerate(windows):
+        # page-level chunks keep the ids of collections built before chunking existed
+        chunk_id = (
+            str(page_index) if strategy == "page" else f"{page_index}-{chunk_index}"
+        )
+        chunks.append(
+            Chunk(
+                chunk_id,
+                text[start:end],
+                {
+                    "page_number": page_number,
+                    "chunk_index": chunk_index,
+                    "char_start": start,
+                    "char_end": end,
+                },
+            )
+        )
+    return chunks
+
+
+def merge_adjacent_chunks(
+    hits: Sequence[tuple[str, dict[str, Any]]],
+) -> list[tuple[str, Any]]:
+    """
+    Merges retrieved chunks that are neighbours on the same page into one passage.
+
+    Overlapping or consecutive chunks of a page are joined using their character
+    offsets, so the overlap is not repeated and the passage reads as continuous page
+    text. Chunks without offsets (page-level collections) are passed through.
+
+    Args:
+        hits: Ranked (chunk_text, metadata) tuples, best first.
+
+    Returns:
+        Ranked (passage_text, page_number) tuples; a merged passage takes the rank of
+        its best chunk.
+    """
+    groups: list[list[tuple[str, dict[str, Any]]]] = []
+    for text, meta in hits:
+        page = meta.get("page_number", "unknown")
+        if "chunk_index" not in meta:
+            groups.append([(text, meta)])
+            continue
+        adjacent = [
+            group
+            for group in groups
+            if "chunk_index" in group[0][1]
+            and group[0][1].get("page_number", "unknown") == page
+            and any(
+                abs(member["chunk_index"] - meta["chunk_index"]) <= 1
+                for _, member in group
+            )
+        ]
+        if not adjacent:
+            groups.append([(text, meta)])
+            continue
+        target = adjacent[0]
+        target.append((text, meta))
+        for group in adjacent[1:]:
+            target.extend(group)
+            groups.remove(group)
+
+    passages = []
+    for group in groups:
+        page = group[0][1].get("page_number", "unknown")
+        if len(group) == 1:
+            passages.append((group[0][0], page))
+            continue
+        members = sorted(group, key=lambda member: member[1]["char_start"])
+        merged, merged_end = members[0][0], members[0][1]["char_end"]
+        for text, meta in members[1:]:
+            if meta["char_end"] <= merged_end:
+                continue
+            if meta["char_start"] < merged_end:
+                merged += text[merged_end - meta["char_start"] :]
+            else:
+                merged += " " + text
+            merged_end = meta["char_end"]
+        passages.append((merged, page))
+    return passages
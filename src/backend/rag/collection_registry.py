@@ -0,0 +1,252 @@
+import logging
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+import numpy as np
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+
+from backend.rag.bm25_index import BM25Index, build_bm25_index, load_bm25_index
+from backend.rag.ingest_manifest import MANIFEST_FILENAME, get_entry
+from backend.rag.llm_embedding_function import get_gemini_ef
+from backend.rag.quantized_index import (
+    DENSE_QUANTIZATION,
+    QuantizedVectors,
+    load_quantized_index,
+    save_quantized_index,
+)
+
+
+log = logging.getLogger("__name__")
+
+# Collections whose full contents (documents, metadata, vectors) are kept in memory
+MAX_SNAPSHOTS = 64
+
+
+class CollectionSnapshot:
+    """All passages of a collection with their ids, metadata and vectors, for search."""
+
+    def __init__(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[Any],
+        embeddings: Any,
+    ):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        # float32 matrix, or QuantizedVectors when DENSE_QUANTIZATION is set
+        self.embeddings = (
+            embeddings
+            if isinstance(embeddings, QuantizedVectors)
+            else np.asarray(embeddings, dtype=np.float32)
+        )
+        # chunk id -> position in the lists above
+        self.index_of = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+
+class _Entry:
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+        self.count: int | None = None
+
+
+class CollectionRegistry:
+    """
+    Process-wide cache of Chroma collection handles, counts, snapshots and keyword
+    indexes.
+
+    Looking a collection up, counting it and loading its vectors and keyword index are
+    done once per process instead of on every query. Entries of a database are dropped when its
+    ingest manifest changes on disk, which every ingestion run (in this or another
+    process) does when it replaces or extends a collection; invalidate() drops them
+    explicitly.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, str], _Entry] = {}
+        self._snapshots: OrderedDict[tuple[str, str], CollectionSnapshot] = (
+            OrderedDict()
+        )
+        self._keyword_indexes: dict[tuple[str, str], BM25Index] = {}
+        self._ingest_versions: dict[tuple[str, str], str | None] = {}
+        self._manifest_mtimes: dict[str, float | None] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _db_path(chroma_client: ClientAPI) -> str:
+        return str(Path(chroma_client.get_settings().persist_directory).resolve())
+
+    def _check_manifest(self, db_path: str) -> None:
+        """Drops the entries of a database whose ingest manifest changed (lock held)."""
+        try:
+            mtime: float | None = (Path(db_path) / MANIFEST_FILENAME).stat().st_mtime
+        except OSError:
+            mtime = None
+        if db_path in self._manifest_mtimes and self._manifest_mtimes[db_path] != mtime:
+            log.info(f"Ingest manifest of {db_path} changed, reloading collections.")
+            self._drop(db_path)
+        self._manifest_mtimes[db_path] = mtime
+
+    def _drop(self, db_path: str, name: str | None = None) -> None:
+        for cached in (
+            self._entries,
+            self._snapshots,
+            self._keyword_indexes,
+            self._ingest_versions,
+        ):
+            for key in [k for k in cached if k[0] == db_path]:
+                if name is None or key[1] == name:
+                    del cached[key]
+
+    def _entry(self, chroma_client: ClientAPI, name: str) -> _Entry:
+        db_path = self._db_path(chroma_client)
+        with self._lock:
+            self._check_manifest(db_path)
+            entry = self._entries.get((db_path, name))
+        if entry is None:
+            collection = chroma_client.get_collection(
+                name=name, embedding_function=get_gemini_ef()
+            )
+            entry = _Entry(collection)
+            with self._lock:
+                entry = self._entries.setdefault((db_path, name), entry)
+        return entry
+
+    def ingest_version(self, chroma_client: ClientAPI, name: str) -> str | None:
+        """
+        Returns an id of the current ingest of a collection, read from the manifest once.
+
+        It combines the source file hash with the time of the last ingest, so it changes
+        whenever the collection is rebuilt or extended; results derived from a collection
+        (e.g. cached answers) are keyed by it. None if the manifest has no entry.
+        """
+        db_path = self._db_path(chroma_client)
+        key = (db_path, name)
+        with self._lock:
+            self._check_manifest(db_path)
+            if key in self._ingest_versions:
+                return self._ingest_versions[key]
+        entry = get_entry(db_path, name)
+        version = f"{entry['file_hash']}@{entry['timestamp']}" if entry else None
+        with self._lock:
+            return self._ingest_versions.setdefault(key, version)
+
+    def get_collection(self, chroma_client: ClientAPI, name: str) -> Collection:
+        """Returns the cached handle of a collection, opening it on first use."""
+        return self._entry(chroma_client, name).collection
+
+    def count(self, chroma_client: ClientAPI, name: str) -> int:
+        """Returns the cached number of passages stored in a collection."""
+        entry = self._entry(chroma_client, name)
+        if entry.count is None:
+            entry.count = entry.collection.count()
+        return entry.count
+
+    def snapshot(self, chroma_client: ClientAPI, name: str) -> CollectionSnapshot:
+        """Returns every passage of a collection with its vector, loaded once."""
+        key = (self._db_path(chroma_client), name)
+        collection = self.get_collection(chroma_client, name)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                return snapshot
+
+        if DENSE_QUANTIZATION is None:
+            data = collection.get(include=["documents", "metadatas", "embeddings"])
+            embeddings: Any = (
+                data["embeddings"] if data["embeddings"] is not None else []
+            )
+        else:
+            data, embeddings = self._quantized_data(
+                collection, key[0], name, DENSE_QUANTIZATION
+            )
+        snapshot = CollectionSnapshot(
+            list(data["ids"]),
+            list(data["documents"] or []),
+            list(data["metadatas"] or []),
+            embeddings,
+        )
+        with self._lock:
+            self._snapshots[key] = snapshot
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        log.debug(f"Loaded {len(snapshot.documents)} passages of '{name}' into memory.")
+        return snapshot
+
+    @staticmethod
+    def _quantized_data(
+        collection: Collection, db_path: str, name: str, dtype: str
+    ) -> tuple[Any, QuantizedVectors]:
+        """
+        Reads a collection's passages with its vectors from the quantized sidecar.
+
+        The float32 vectors are read from Chroma (and the sidecar written) only when
+        the sidecar is missing or does not cover the collection's chunks.
+        """
+        vectors = load_quantized_index(db_path, name, dtype)
+        if vectors is not None:
+            data = collection.get(include=["documents", "metadatas"])
+            try:
+                return data, vectors.select(list(data["ids"]))
+            except KeyError:
+                log.info(f"Quantized vectors of '{name}' are stale, rebuilding them.")
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        ids = list(data["ids"])
+        vectors = QuantizedVectors.from_embeddings(
+            ids, data["embeddings"] if data["embeddings"] is not None else [], dtype
+        )
+        save_quantized_index(db_path, name, vectors)
+        return data, vectors
+
+    def stored_keyword_index(
+        self, chroma_client: ClientAPI, name: str
+    ) -> BM25Index | None:
+        """
+        Returns the persisted BM25 index of a collection, loaded from disk once.
+
+        Returns None if the collection has no index or it does not cover every
+        chunk; unlike keyword_index, the collection is never read to build one.
+        """
+        db_path = self._db_path(chroma_client)
+        with self._lock:
+            index = self._keyword_indexes.get((db_path, name))
+        if index is None:
+            index = load_bm25_index(db_path, name)
+            if index is None or len(index.ids) != self.count(chroma_client, name):
+                return None
+            with self._lock:
+                index = self._keyword_indexes.setdefault((db_path, name), index)
+        return index
+
+    def keyword_index(self, chroma_client: ClientAPI, name: str) -> BM25Index:
+        """
+        Returns the BM25 index of a collection, loaded from disk once.
+
+        Collections ingested before keyword indexes existed (or whose index does not
+        cover every chunk) get theirs built from the snapshot and persisted on first use.
+        """
+        index = self.stored_keyword_index(chroma_client, name)
+        if index is None:
+            db_path = self._db_path(chroma_client)
+            snapshot = self.snapshot(chroma_client, name)
+            index = build_bm25_index(db_path, name, snapshot.ids, snapshot.documents)
+            with self._lock:
+                index = self._keyword_indexes.setdefault((db_path, name), index)
+        return index
+
+    def invalidate(self, chroma_client: ClientAPI, name: str | None = None) -> None:
+        """Forgets one collection (or all collections of the client's database)."""
+        with self._lock:
+            self._drop(self._db_path(chroma_client), name)
+
+
+@cache
+def get_collection_registry() -> CollectionRegistry:
+    """Returns the process-wide collection registry, creating it on first use."""
+    return CollectionRegistry()
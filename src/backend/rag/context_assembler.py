@@ -0,0 +1,136 @@
+import logging
+import math
+from collections.abc import Sequence
+from typing import Any
+
+
+log = logging.getLogger("__name__")
+
+# Local token estimate: Gemini averages roughly 4 characters per token on English
+# text; Polish (diacritics, long inflected words) tokenizes denser, so be conservative
+CHARS_PER_TOKEN = 3.5
+# Maximum number of context tokens assembled per request, by model name prefix
+# (the longest matching prefix wins); far below the context windows on purpose,
+# as input size drives both latency and cost
+CONTEXT_TOKEN_BUDGETS = {
+    "gemini-2.0-flash": 32_000,
+    "gemini-2.0-flash-thinking": 16_000,
+}
+# Budget of models not listed above
+DEFAULT_CONTEXT_TOKEN_BUDGET = 16_000
+# Candidate passages retrieved per passage that fits in the budget on average, so the
+# assembler can skip oversized or duplicated ones and still fill the budget
+CANDIDATE_OVERFETCH = 1.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of model tokens of text without calling the API."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_context_budget(model_name: str | None) -> int:
+    """
+    Returns the context token budget of a model.
+
+    Args:
+        model_name: Model name, with or without the "models/" prefix.
+    """
+    if not model_name:
+        return DEFAULT_CONTEXT_TOKEN_BUDGET
+    name = model_name.removeprefix("models/")
+    matches = [prefix for prefix in CONTEXT_TOKEN_BUDGETS if name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_TOKEN_BUDGET
+    return CONTEXT_TOKEN_BUDGETS[max(matches, key=len)]
+
+
+def candidate_count(documents: Sequence[str], budget_tokens: int) -> int:
+    """
+    Returns how many ranked passages to retrieve to fill a token budget.
+
+    Args:
+        documents: All passages of the collection.
+        budget_tokens: Context token budget.
+    """
+    if not documents:
+        return 0
+    average_tokens = max(1, sum(map(estimate_tokens, documents)) // len(documents))
+    wanted = math.ceil(budget_tokens / average_tokens * CANDIDATE_OVERFETCH)
+    return min(len(documents), max(1, wanted))
+
+
+class AssembledContext:
+    """
+    Passages selected for a prompt and their token cost.
+
+    Attributes:
+        text: The formatted context (header, passages, footer).
+        passages: The selected (passage_text, page_number) tuples, best first.
+        tokens_used: Estimated tokens of text.
+        budget_tokens: The budget it was assembled for.
+        skipped: Number of candidates dropped as duplicates or for lack of budget.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        passages: list[tuple[str, Any]],
+        tokens_used: int,
+        budget_tokens: int,
+        skipped: int,
+    ) -> None:
+        self.text = text
+        self.passages = passages
+        self.tokens_used = tokens_used
+        self.budget_tokens = budget_tokens
+        self.skipped = skipped
+
+
+def assemble_context(
+    passages_with_pages: Sequence[tuple[str, Any]],
+    budget_tokens: int,
+    header: str = "",
+    footer: str = "",
+) -> AssembledContext:
+    """
+    Packs the highest-ranked passages into a context of at most budget_tokens.
+
+    Passages are taken in rank order; a passage repeating an already selected one
+    from the same page is skipped, and a passage that does not fit in the remaining
+    budget is skipped so smaller, lower-ranked ones can still fill it. The selected
+    passages keep their rank order, so the best evidence comes first.
+
+    Args:
+        passages_with_pages: Ranked (passage_text, page_number) tuples, best first.
+        budget_tokens: Maximum estimated tokens of the assembled context.
+        header: Text placed before the passages (counted against the budget).
+        footer: Text placed after the passages (counted against the budget).
+
+    Returns:
+        The assembled context with the selected passages and tokens used.
+    """
+    tokens_used = estimate_tokens(header) + estimate_tokens(footer)
+    selected: list[tuple[str, Any]] = []
+    # whitespace-normalized texts of the selected passages, by page
+    selected_texts: dict[str, list[str]] = {}
+    parts = [header]
+    skipped = 0
+    for passage, page_number in passages_with_pages:
+        text = " ".join(passage.split())
+        page_texts = selected_texts.setdefault(str(page_number), [])
+        if any(text in other or other in text for other in page_texts):
+            skipped += 1
+            continue
+        part = f"Page {page_number}: {passage}\n"
+        part_tokens = estimate_tokens(part)
+        if tokens_used + part_tokens > budget_tokens:
+            skipped += 1
+            continue
+        selected.append((passage, page_number))
+        page_texts.append(text)
+        parts.append(part)
+        tokens_used += part_tokens
+    parts.append(footer)
+    return AssembledContext(
+        "".join(parts), selected, tokens_used, budget_tokens, skipped
+    )
@@ -0,0 +1,278 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from chromadb.api import ClientAPI
+
+from backend.document_id_manager import get_entries
+from backend.rag.call_embeddings import embed_query
+from backend.rag.chroma_collection_manager import (
+    get_distance_space,
+    get_similarity_threshold,
+)
+from backend.rag.chunking import merge_adjacent_chunks
+from backend.rag.collection_registry import get_collection_registry
+from backend.rag.fusion import fuse
+from backend.rag.vector_db_name_generation import (
+    extract_title_from_filename,
+    generate_vector_db_document_name,
+)
+
+
+log = logging.getLogger("__name__")
+
+# Searching every collection of the corpus at once should take at most this long;
+# slower searches are logged as warnings
+CORPUS_SEARCH_LATENCY_TARGET_SECONDS = 0.5
+# Chunks kept after the global merge, and the most a request may ask for
+CORPUS_TOP_K = 20
+CORPUS_MAX_TOP_K = 100
+# Chunks each collection contributes per retrieval leg before the global merge
+CHUNKS_PER_COLLECTION = 5
+# Collections searched concurrently
+CORPUS_SEARCH_WORKERS = 8
+
+_executor = ThreadPoolExecutor(
+    max_workers=CORPUS_SEARCH_WORKERS, thread_name_prefix="corpus-search"
+)
+
+
+class CorpusDocument:
+    """
+    A PDF of the corpus and its collection.
+
+    Attributes:
+        document_id: ID from document_id_manager (None if the file never got one).
+        title: Display title of the document.
+        filename: Name of the PDF file.
+        collection_name: Name of its Chroma collection.
+    """
+
+    def __init__(
+        self,
+        document_id: str | None,
+        title: str,
+        filename: str,
+        collection_name: str,
+    ) -> None:
+        self.document_id = document_id
+        self.title = title
+        self.filename = filename
+        self.collection_name = collection_name
+
+
+def list_corpus_documents(
+    pdf_dir: Path, chroma_client: ClientAPI, max_length: int = 60
+) -> list[CorpusDocument]:
+    """
+    Returns the documents of a PDF directory that have a collection.
+
+    Args:
+        pdf_dir: Directory of the scraped PDFs.
+        chroma_client: ChromaDB client instance.
+        max_length: Maximum collection name length used at ingest.
+    """
+    existing = {collection.name for collection in chroma_client.list_collections()}
+    entries = get_entries()
+    documents = []
+    for pdf in sorted(pdf_dir.glob("*.pdf")):
+        collection_name = generate_vector_db_document_name(pdf, max_length=max_length)
+        if collection_name not in existing:
+            continue
+        # scraped files are named "<id>_<date>_<title>.pdf", see knf_scraping
+        parts = pdf.stem.split("_", 2)
+        entry = entries.get(parts[2]) if len(parts) == 3 else None
+        if entry is not None:
+            document_id: str | None = entry["id"]
+        else:
+            document_id = parts[0] if parts[0].isdigit() else None
+        documents.append(
+            CorpusDocument(
+                document_id,
+                extract_title_from_filename(pdf.name),
+                pdf.name,
+                collection_name,
+            )
+        )
+    return documents
+
+
+def _distance_to_similarity(distance: float, space: str) -> float:
+    """Converts a Chroma distance to cosine similarity (vectors are unit length)."""
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+def _search_collection(
+    query: str,
+    query_embedding: Any,
+    chroma_client: ClientAPI,
+    collection_name: str,
+    n_results: int,
+) -> tuple[list[tuple[str, float]], list[tuple[str, float]], dict[str, Any]]:
+    """
+    Runs both retrieval legs on one collection without loading its vectors.
+
+    Keyword scores are divided by the index's upper bound (see BM25Index.max_score),
+    since raw BM25 scores of different collections are not comparable. Collections
+    without a persisted keyword index are searched by the dense leg only; building
+    their index here would read every chunk of the collection.
+
+    Returns:
+        The keyword and dense rankings of (chunk_id, score) and chunk id ->
+        (passage, metadata) of every ranked chunk.
+    """
+    registry = get_collection_registry()
+    collection = registry.get_collection(chroma_client, collection_name)
+    chunks: dict[str, Any] = {}
+
+    # Dense leg through the collection's ANN index
+    space = get_distance_space(collection)
+    threshold = get_similarity_threshold(collection)
+    hits: Any = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        include=["documents", "metadatas", "distances"],
+    )
+    dense = []
+    for chunk_id, passage, meta, distance in zip(
+        hits["ids"][0],
+        hits["documents"][0],
+        hits["metadatas"][0],
+        hits["distances"][0],
+    ):
+        similarity = _distance_to_similarity(float(distance), space)
+        if similarity >= threshold:
+            chunks[chunk_id] = (passage, meta or {})
+            dense.append((chunk_id, similarity))
+
+    # Keyword leg; only the texts of its hits are read from the collection
+    index = registry.stored_keyword_index(chroma_client, collection_name)
+    if index is None:
+        log.debug(f"{collection_name} has no keyword index, searching it densely.")
+        keyword = []
+    else:
+        bound = index.max_score(query)
+        keyword = [
+            (chunk_id, score / bound)
+            for chunk_id, score in index.search(query, n_results)
+        ]
+    missing = [chunk_id for chunk_id, _ in keyword if chunk_id not in chunks]
+    if missing:
+        stored = collection.get(ids=missing, include=["documents", "metadatas"])
+        for chunk_id, passage, meta in zip(
+            stored["ids"], stored["documents"] or [], stored["metadatas"] or []
+        ):
+            chunks[chunk_id] = (passage, meta or {})
+    keyword = [(chunk_id, score) for chunk_id, score in keyword if chunk_id in chunks]
+    return keyword, dense, chunks
+
+
+def search_corpus(
+    query: str,
+    chroma_client: ClientAPI,
+    documents: list[CorpusDocument],
+    top_k: int = CORPUS_TOP_K,
+    chunks_per_collection: int = CHUNKS_PER_COLLECTION,
+) -> dict[str, Any]:
+    """
+    Searches every document of the corpus in one retrieval pass.
+
+    The query is embedded once; all collections are then searched concurrently and
+    their keyword and dense hits are merged into global rankings, which are fused
+    (see fusion) into one top-k list. Answers "which recommendations mention X".
+
+    Args:
+        query: Text to search.
+        chroma_client: ChromaDB client instance.
+        documents: Documents to search, see list_corpus_documents.
+        top_k: Number of chunks kept after the global merge.
+        chunks_per_collection: Chunks each collection contributes per leg.
+
+    Returns:
+        Dictionary with the matching documents (best first, each with its passages
+        and page numbers), the elapsed time and the latency target.
+    """
+    started = time.perf_counter()
+    query_embedding = embed_query(query)
+
+    futures = {
+        document.collection_name: _executor.submit(
+            _search_collection,
+            query,
+            query_embedding,
+            chroma_client,
+            document.collection_name,
+            chunks_per_collection,
+        )
+        for document in documents
+    }
+    keyword: list[tuple[str, float]] = []
+    dense: list[tuple[str, float]] = []
+    # "<collection>/<chunk id>" -> (passage, metadata); chunk ids are unique only
+    # within a collection
+    chunks: dict[str, Any] = {}
+    collection_of: dict[str, str] = {}
+    for collection_name, future in futures.items():
+        try:
+            collection_keyword, collection_dense, collection_chunks = future.result()
+        except Exception as e:
+            log.warning(f"Corpus search skipped {collection_name}: {e}")
+            continue
+        for chunk_id, chunk in collection_chunks.items():
+            key = f"{collection_name}/{chunk_id}"
+            chunks[key] = chunk
+            collection_of[key] = collection_name
+        keyword += [(f"{collection_name}/{c}", s) for c, s in collection_keyword]
+        dense += [(f"{collection_name}/{c}", s) for c, s in collection_dense]
+
+    fused = fuse(
+        {
+            "keyword": sorted(keyword, key=lambda hit: hit[1], reverse=True),
+            "dense": sorted(dense, key=lambda hit: hit[1], reverse=True),
+        }
+    )[:top_k]
+    by_collection: dict[str, list[tuple[str, float]]] = {}
+    for key, score in fused:
+        by_collection.setdefault(collection_of[key], []).append((key, score))
+
+    by_name = {document.collection_name: document for document in documents}
+    matches: list[dict[str, Any]] = []
+    for name, hits in by_collection.items():
+        document = by_name[name]
+        passages = merge_adjacent_chunks([chunks[key] for key, _ in hits])
+        matches.append(
+            {
+                "document_id": document.document_id,
+                "title": document.title,
+                "filename": document.filename,
+                "collection_name": name,
+                "score": hits[0][1],
+                "passages": [
+                    {"page_number": page, "passage": passage}
+                    for passage, page in passages
+                ],
+            }
+        )
+    matches.sort(key=lambda match: float(match["score"]), reverse=True)
+
+    elapsed = time.perf_counter() - started
+    message = (
+        f"Corpus search over {len(documents)} documents took {elapsed:.3f}s "
+        f"(target {CORPUS_SEARCH_LATENCY_TARGET_SECONDS}s), "
+        f"{len(matches)} documents matched."
+    )
+    if elapsed > CORPUS_SEARCH_LATENCY_TARGET_SECONDS:
+        log.warning(message)
+    else:
+        log.info(message)
+    return {
+        "query": query,
+        "documents": matches,
+        "searched_documents": len(documents),
+        "elapsed_seconds": elapsed,
+        "latency_target_seconds": CORPUS_SEARCH_LATENCY_TARGET_SECONDS,
+    }
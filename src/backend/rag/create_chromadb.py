@@ -1,36 +1,92 @@
-import time
 import logging
+from typing import Any
 
 import chromadb
+from chromadb.api import ClientAPI
 
 
+from backend.rag.bm25_index import build_bm25_index
+from backend.rag.quantized_index import remove_quantized_index
+from backend.rag.chunking import CHUNKING_LAYOUT
+from backend.rag.collection_registry import get_collection_registry
 from backend.rag.llm_embedding_function import get_gemini_ef
+from backend.rag.call_embeddings import EMBEDDING_MODEL
 
 
 log = logging.getLogger("__name__")
 
+# HNSW index of new collections: distance metric ("cosine", "l2" or "ip"), graph
+# degree (M) and candidate list sizes when building and querying (ef); higher M / ef
+# raise recall at the cost of memory and latency. Existing collections keep the
+# settings they were created with.
+HNSW_SPACE = "cosine"
+HNSW_M = 16
+HNSW_CONSTRUCTION_EF = 100
+HNSW_SEARCH_EF = 100
 
-def create_chroma_db(documents: list, path: str, name: str, page_numbers: list = None):  # type: ignore
+
+def hnsw_metadata(
+    space: str = HNSW_SPACE,
+    m: int = HNSW_M,
+    construction_ef: int = HNSW_CONSTRUCTION_EF,
+    search_ef: int = HNSW_SEARCH_EF,
+) -> dict[str, Any]:
+    """Returns the collection metadata configuring Chroma's HNSW index."""
+    return {
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+def open_document_collection(
+    chroma_client: ClientAPI, name: str, hnsw: dict[str, Any] | None = None
+) -> chromadb.Collection:
     """
-    Creates a chroma database.
+    Opens the collection of a document, creating it if needed.
 
     Args:
-        documents: Arr of documents to be added to a database.
-        path: The path where the created database will be stored.
-        name: name of the collection within the database.
+        chroma_client: ChromaDB client instance.
+        name: Name of the collection.
+        hnsw: HNSW settings of a new collection, see hnsw_metadata (defaults to it).
 
     Returns:
-        Tuple: A tuple containing created chroma collection and its name.
+        chromadb.Collection: The document's collection.
     """
-    chroma_client = chromadb.PersistentClient(path=path)
-    db = chroma_client.create_collection(name=name, embedding_function=get_gemini_ef())
+    return chroma_client.get_or_create_collection(
+        name=name,
+        embedding_function=get_gemini_ef(),
+        metadata={
+            "embedding_model": EMBEDDING_MODEL,
+            "chunking": CHUNKING_LAYOUT,
+            **(hnsw if hnsw is not None else hnsw_metadata()),
+        },
+    )
 
-    for index, document in enumerate(documents):
 
-        page_num = page_numbers[index] if page_numbers else index + 1
+def finish_document_collection(
+    path: str, chroma_client: ClientAPI, collection: chromadb.Collection
+) -> None:
+    """
+    Refreshes the indexes derived from a collection after its chunks were written.
 
-        db.add(documents=document, ids=str(index), metadatas={"page_number": page_num})
-        time.sleep(5)
-        log.debug(f"Chunk {index} of {document} from page {page_num} was vectorized.")
+    The BM25 keyword index is built from the stored chunks and persisted, the quantized
+    sidecar is dropped (it is rebuilt from the new vectors on first use) and queries in
+    this process reload the collection's count, vectors and keyword index.
 
-    return db, name
+    Args:
+        path: Path of the vector database.
+        chroma_client: ChromaDB client instance.
+        collection: The written collection.
+    """
+    remove_quantized_index(path, collection.name)
+    try:
+        stored = collection.get(include=["documents"])
+        build_bm25_index(
+            path, collection.name, stored["ids"], stored["documents"] or []
+        )
+    except Exception as e:
+        # queries build the keyword index on first use instead
+        log.warning(f"Keyword index of {collection.name} was not built: {e}")
+    get_collection_registry().invalidate(chroma_client, collection.name)
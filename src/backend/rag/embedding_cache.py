@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+from backend.utils.paths import CACHE_DIR
+
+
+log = logging.getLogger("__name__")
+
+EMBEDDING_CACHE_PATH = CACHE_DIR / "embeddings" / "embeddings.sqlite3"
+# Number of vectors kept in memory before the least recently used ones are evicted
+MEMORY_CACHE_SIZE = 4096
+
+CacheKey = tuple[str, str, str]
+
+
+def text_hash(text: str) -> str:
+    """Returns the sha256 hex digest used to address a text in the cache."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with an in-memory LRU in front of a SQLite store.
+
+    Entries are keyed by (model, task_type, sha256(text)), so the same passage embedded
+    at ingest, in hybrid search and in reranking is requested from the API only once.
+    Vectors are stored as float32 blobs.
+
+    Args:
+        path: Location of the SQLite database file.
+        max_memory_entries: Maximum number of vectors kept in the in-memory LRU.
+    """
+
+    def __init__(
+        self,
+        path: Path = EMBEDDING_CACHE_PATH,
+        max_memory_entries: int = MEMORY_CACHE_SIZE,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._memory: OrderedDict[CacheKey, np.ndarray] = OrderedDict()
+        self._max_memory_entries = max_memory_entries
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, task_type TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, PRIMARY KEY (model, task_type, text_hash))"
+        )
+        self._connection.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(
+        self, model: str, task_type: str, texts: list[str]
+    ) -> list[np.ndarray | None]:
+        """
+        Looks up cached vectors for texts.
+
+        Args:
+            model: Embedding model name.
+            task_type: Embedding task type (e.g. "retrieval_document").
+            texts: Texts to look up.
+
+        Returns:
+            A list aligned with texts holding the cached vector or None on a miss.
+        """
+        keys = [(model, task_type, text_hash(text)) for text in texts]
+        found: list[np.ndarray | None] = [None] * len(keys)
+        with self._lock:
+            on_disk = []
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[i] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    on_disk.append(i)
+
+            for i in on_disk:
+                row = self._connection.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND task_type = ? AND text_hash = ?",
+                    keys[i],
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    continue
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(keys[i], vector)
+                found[i] = vector
+                self.disk_hits += 1
+        return found
+
+    def put_many(
+        self, model: str, task_type: str, texts: list[str], vectors: list[list[float]]
+    ) -> None:
+        """
+        Stores vectors for texts in memory and on disk.
+
+        Args:
+            model: Embedding model name.
+            task_type: Embedding task type.
+            texts: Embedded texts.
+            vectors: Embedding vectors aligned with texts.
+        """
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, task_type, text_hash(text))
+                array = np.asarray(vector, dtype=np.float32)
+                self._remember(key, array)
+                rows.append((*key, array.tobytes()))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current hit rate."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+@cache
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, creating it on first use."""
+    log.debug(f"Embedding cache opened at {EMBEDDING_CACHE_PATH}.")
+    return EmbeddingCache()
@@ -0,0 +1,185 @@
+import logging
+import queue
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cache
+from threading import Lock, Thread
+from typing import cast
+
+import google.generativeai as genai  # type: ignore[unused-ignore]
+
+from backend.utils.rate_limiter import AdaptiveThrottle, TokenBucket
+
+
+log = logging.getLogger("__name__")
+
+# Maximum number of texts the Gemini batchEmbedContents endpoint accepts per request
+MAX_BATCH_SIZE = 100
+# Number of batch requests allowed in flight at the same time
+MAX_CONCURRENT_BATCHES = 4
+# Embedding API quota (requests, not texts)
+EMBEDDING_REQUESTS_PER_MINUTE = 1500
+# How long the dispatcher waits for other callers before sending a batch
+COALESCE_WINDOW_SECONDS = 0.01
+
+
+class _PendingRequest:
+    """Texts submitted by one caller and the future its result is delivered to."""
+
+    def __init__(self, model: str, task_type: str, texts: list[str]) -> None:
+        self.model = model
+        self.task_type = task_type
+        self.texts = texts
+        self.future: Future[list[list[float]]] = Future()
+
+
+class EmbeddingClient:
+    """
+    Batched Gemini embedding client shared by every embedding call in the process.
+
+    Callers submit lists of texts. Requests arriving within the coalescing window are
+    merged, deduplicated per (model, task_type), split into batches of at most
+    max_batch_size texts and sent by a bounded pool of workers under a token-bucket
+    rate limiter. Quota errors are retried with exponential backoff.
+
+    Args:
+        max_batch_size: Maximum number of texts per API request.
+        max_concurrent_batches: Number of API requests allowed in flight.
+        requests_per_minute: Embedding request quota.
+        coalesce_window: Seconds to wait for other callers before dispatching.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_concurrent_batches: int = MAX_CONCURRENT_BATCHES,
+        requests_per_minute: int = EMBEDDING_REQUESTS_PER_MINUTE,
+        coalesce_window: float = COALESCE_WINDOW_SECONDS,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.coalesce_window = coalesce_window
+        self._bucket = TokenBucket(
+            rate=requests_per_minute / 60, capacity=max_concurrent_batches
+        )
+        self._throttle = AdaptiveThrottle()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches, thread_name_prefix="embedding-batch"
+        )
+        self._queue: queue.Queue[_PendingRequest] = queue.Queue()
+        self._dispatcher = Thread(
+            target=self._dispatch_loop, name="embedding-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def submit(
+        self, texts: list[str], model: str, task_type: str
+    ) -> "Future[list[list[float]]]":
+        """
+        Queues texts for embedding without waiting for the result.
+
+        Returns:
+            A future resolving to one vector per text, in the same order as texts.
+        """
+        request = _PendingRequest(model, task_type, list(texts))
+        if not request.texts:
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def embed(self, texts: list[str], model: str, task_type: str) -> list[list[float]]:
+        """
+        Embeds texts, blocking until every batch containing them has returned.
+
+        Args:
+            texts: Texts to embed.
+            model: Gemini embedding model name.
+            task_type: Gemini embedding task type (e.g. "retrieval_document").
+
+        Returns:
+            One embedding vector per text, in the same order as texts.
+        """
+        return self.submit(texts, model, task_type).result()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.coalesce_window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._dispatch(pending)
+            except Exception as e:
+                for request in pending:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _dispatch(self, pending: list[_PendingRequest]) -> None:
+        groups: dict[tuple[str, str], list[_PendingRequest]] = defaultdict(list)
+        for request in pending:
+            groups[(request.model, request.task_type)].append(request)
+
+        for (model, task_type), requests in groups.items():
+            unique_texts = list(dict.fromkeys(t for r in requests for t in r.texts))
+            batches = [
+                unique_texts[i : i + self.max_batch_size]
+                for i in range(0, len(unique_texts), self.max_batch_size)
+            ]
+            log.debug(
+                f"Embedding {len(unique_texts)} texts from {len(requests)} callers "
+                f"in {len(batches)} batches ({model}, {task_type})."
+            )
+            batch_futures = [
+                self._executor.submit(self._embed_batch, batch, model, task_type)
+                for batch in batches
+            ]
+            self._resolve_when_done(requests, batches, batch_futures)
+
+    @staticmethod
+    def _resolve_when_done(
+        requests: list[_PendingRequest],
+        batches: list[list[str]],
+        batch_futures: list[Future],
+    ) -> None:
+        lock = Lock()
+        remaining = [len(batch_futures)]
+
+        def on_batch_done(_: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            errors = [f.exception() for f in batch_futures if f.exception()]
+            if errors:
+                for request in requests:
+                    request.future.set_exception(errors[0])
+                return
+            vectors = {
+                text: vector
+                for batch, future in zip(batches, batch_futures)
+                for text, vector in zip(batch, future.result())
+            }
+            for request in requests:
+                request.future.set_result([vectors[t] for t in request.texts])
+
+        for future in batch_futures:
+            future.add_done_callback(on_batch_done)
+
+    def _embed_batch(
+        self, texts: list[str], model: str, task_type: str
+    ) -> list[list[float]]:
+        self._bucket.acquire()
+        response = self._throttle.call(
+            genai.embed_content, model=model, content=texts, task_type=task_type
+        )
+        return cast(list[list[float]], response["embedding"])
+
+
+@cache
+def get_embedding_client() -> EmbeddingClient:
+    """Returns the process-wide embedding client, creating it on first use."""
+    return EmbeddingClient()
@@ -0,0 +1,96 @@
+from collections.abc import Callable, Mapping, Sequence
+
+
+# Fusion used by hybrid search, a key of FUSION_METHODS
+FUSION_METHOD = "rrf"
+# Rank offset of reciprocal rank fusion; larger values flatten the rank differences
+RRF_K = 60
+# Relative weight of each retrieval leg
+LEG_WEIGHTS = {"keyword": 1.0, "dense": 1.0}
+
+Ranking = Sequence[tuple[str, float]]
+
+
+def reciprocal_rank_fusion(
+    rankings: Mapping[str, Ranking],
+    weights: Mapping[str, float] = LEG_WEIGHTS,
+    k: int = RRF_K,
+) -> list[tuple[str, float]]:
+    """
+    Fuses rankings by summing weight / (k + rank) of each chunk over the legs.
+
+    Only ranks are used, so legs with incomparable scores (BM25, cosine) mix well.
+
+    Args:
+        rankings: Leg name -> ranked (chunk_id, score) tuples, best first.
+        weights: Leg name -> weight (legs not listed weigh 1.0).
+        k: Rank offset.
+
+    Returns:
+        (chunk_id, fused_score) tuples, best first.
+    """
+    fused: dict[str, float] = {}
+    for leg, ranking in rankings.items():
+        weight = weights.get(leg, 1.0)
+        for rank, (chunk_id, _) in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def weighted_score_fusion(
+    rankings: Mapping[str, Ranking],
+    weights: Mapping[str, float] = LEG_WEIGHTS,
+) -> list[tuple[str, float]]:
+    """
+    Fuses rankings by summing min-max normalized scores of each chunk over the legs.
+
+    Args:
+        rankings: Leg name -> ranked (chunk_id, score) tuples, best first.
+        weights: Leg name -> weight (legs not listed weigh 1.0).
+
+    Returns:
+        (chunk_id, fused_score) tuples, best first.
+    """
+    fused: dict[str, float] = {}
+    for leg, ranking in rankings.items():
+        if not ranking:
+            continue
+        weight = weights.get(leg, 1.0)
+        scores = [score for _, score in ranking]
+        low, high = min(scores), max(scores)
+        for chunk_id, score in ranking:
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight * normalized
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+FUSION_METHODS: dict[str, Callable[..., list[tuple[str, float]]]] = {
+    "rrf": reciprocal_rank_fusion,
+    "weighted": weighted_score_fusion,
+}
+
+
+def fuse(
+    rankings: Mapping[str, Ranking],
+    method: str = FUSION_METHOD,
+    weights: Mapping[str, float] = LEG_WEIGHTS,
+) -> list[tuple[str, float]]:
+    """
+    Merges the rankings of the retrieval legs into one, deduplicated by chunk id.
+
+    Works only on ranks and scores the legs already computed, so it makes no
+    requests.
+
+    Args:
+        rankings: Leg name -> ranked (chunk_id, score) tuples, best first.
+        method: Key of FUSION_METHODS.
+        weights: Leg name -> weight.
+
+    Returns:
+        (chunk_id, fused_score) tuples, best first.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(
+            f"Unknown fusion method '{method}', expected one of {list(FUSION_METHODS)}"
+        )
+    return FUSION_METHODS[method](rankings, weights=weights)
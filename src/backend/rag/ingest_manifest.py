@@ -0,0 +1,167 @@
+import json
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from threading import Lock
+from typing import Any, Literal, TypedDict, cast
+
+from backend.utils.atomic_write import write_json_atomic
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+_lock = Lock()
+
+IngestAction = Literal["skip", "resume", "rebuild"]
+
+
+class ManifestEntry(TypedDict):
+    source: str
+    file_hash: str
+    page_count: int
+    chunk_ids: list[str]
+    embedding_model: str
+    chunking: str
+    complete: bool
+    timestamp: int
+
+
+def _manifest_path(db_path: str) -> Path:
+    return Path(db_path) / MANIFEST_FILENAME
+
+
+def _load_manifest(db_path: str) -> dict[str, ManifestEntry]:
+    path = _manifest_path(db_path)
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return cast(dict[str, ManifestEntry], json.load(f))
+    return {}
+
+
+def _save_manifest(db_path: str, manifest: dict) -> None:
+    # atomic, a crash never leaves a truncated manifest
+    write_json_atomic(_manifest_path(db_path), manifest)
+
+
+def get_entry(db_path: str, name: str) -> ManifestEntry | None:
+    """Returns the manifest entry of a collection, if it was ever ingested."""
+    with _lock:
+        return _load_manifest(db_path).get(name)
+
+
+def plan_ingest(
+    entry: ManifestEntry | None,
+    file_hash: str,
+    embedding_model: str,
+    collection_exists: bool,
+    chunking: str = "page",
+    collection_metadata: Mapping[str, Any] | None = None,
+) -> IngestAction:
+    """
+    Decides what ingestion has to do for a document.
+
+    Args:
+        entry: Manifest entry of the document's collection, if any.
+        file_hash: Current content hash of the PDF.
+        embedding_model: Embedding model ingestion would use now.
+        collection_exists: Whether the collection is present in the vector database.
+        chunking: Chunk layout ingestion would use now (see chunking.chunking_layout).
+        collection_metadata: Metadata of the existing collection, consulted when it
+            has no manifest entry.
+
+    Returns:
+        "skip" when the collection is complete and up to date, "resume" when it was
+        interrupted and "rebuild" when the file, the embedding model or the chunk
+        layout changed.
+    """
+    if not collection_exists:
+        return "rebuild"
+    if entry is None:
+        # a collection without an entry (e.g. built before the manifest existed) can
+        # only be resumed if it records the same layout, otherwise new chunks would
+        # be mixed with chunks of another layout or model
+        metadata = collection_metadata or {}
+        if (
+            metadata.get("embedding_model") == embedding_model
+            and metadata.get("chunking") == chunking
+        ):
+            return "resume"
+        return "rebuild"
+    if (
+        entry["file_hash"] != file_hash
+        or entry["embedding_model"] != embedding_model
+        # entries written before chunking existed hold one chunk per page
+        or entry.get("chunking", "page") != chunking
+    ):
+        return "rebuild"
+    return "skip" if entry["complete"] else "resume"
+
+
+def start_entry(
+    db_path: str,
+    name: str,
+    source: str,
+    file_hash: str,
+    page_count: int,
+    embedding_model: str,
+    chunk_ids: list[str] | None = None,
+    chunking: str = "page",
+) -> None:
+    """Creates (or resets) the manifest entry of a collection before chunks are written."""
+    with _lock:
+        manifest = _load_manifest(db_path)
+        manifest[name] = {
+            "source": source,
+            "file_hash": file_hash,
+            "page_count": page_count,
+            "chunk_ids": list(chunk_ids or []),
+            "embedding_model": embedding_model,
+            "chunking": chunking,
+            "complete": False,
+            "timestamp": int(time.time()),
+        }
+        _save_manifest(db_path, manifest)
+
+
+def commit_chunks(db_path: str, name: str, chunk_ids: list[str]) -> None:
+    """Records chunk ids that were written to the collection."""
+    with _lock:
+        manifest = _load_manifest(db_path)
+        entry = manifest[name]
+        entry["chunk_ids"] = list(dict.fromkeys(entry["chunk_ids"] + chunk_ids))
+        entry["timestamp"] = int(time.time())
+        _save_manifest(db_path, manifest)
+
+
+def mark_complete(
+    db_path: str,
+    name: str,
+    page_count: int | None = None,
+    chunk_ids: list[str] | None = None,
+) -> None:
+    """
+    Marks a collection as fully ingested.
+
+    Args:
+        db_path: Path of the vector database.
+        name: Name of the collection.
+        page_count: Final page count to record, if known.
+        chunk_ids: Chunk ids written since the entry was started, recorded in the same
+            manifest write.
+    """
+    with _lock:
+        manifest = _load_manifest(db_path)
+        entry = manifest[name]
+        entry["complete"] = True
+        if page_count is not None:
+            entry["page_count"] = page_count
+        if chunk_ids:
+            entry["chunk_ids"] = list(dict.fromkeys(entry["chunk_ids"] + chunk_ids))
+        entry["timestamp"] = int(time.time())
+        _save_manifest(db_path, manifest)
+
+
+def remove_entry(db_path: str, name: str) -> None:
+    """Forgets a collection, e.g. after it was deleted."""
+    with _lock:
+        manifest = _load_manifest(db_path)
+        if manifest.pop(name, None) is not None:
+            _save_manifest(db_path, manifest)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache, partial
+from threading import Lock
+from typing import Any, TypeVar
+
+log = logging.getLogger("__name__")
+
+T = TypeVar("T")
+
+# Worker processes for CPU-bound work (PDF extraction)
+DEFAULT_CPU_WORKERS = os.cpu_count() or 1
+# Worker threads for I/O-bound work (hashing, embedding requests, Chroma writes)
+DEFAULT_IO_WORKERS = 8
+
+
+class StageMetrics:
+    """Counters of one pipeline stage, used to find where ingestion is bottlenecked."""
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_queued": self.max_queued,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class IngestRuntime:
+    """
+    Long-lived executors shared by every ingestion task.
+
+    CPU-bound work goes to a process pool (cpu_executor, handed to the PDF extractor)
+    so it is not serialized by the GIL, I/O-bound work goes to a thread pool. Both are
+    created once and reused for every document. Each submission is attributed to a
+    named stage whose queue depth, in-flight count and busy time are tracked.
+
+    Args:
+        cpu_workers: Number of worker processes.
+        io_workers: Number of worker threads.
+    """
+
+    def __init__(
+        self,
+        cpu_workers: int = DEFAULT_CPU_WORKERS,
+        io_workers: int = DEFAULT_IO_WORKERS,
+    ) -> None:
+        self.cpu_executor = ProcessPoolExecutor(max_workers=cpu_workers)
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="ingest-io"
+        )
+        self._stages: dict[str, StageMetrics] = {}
+        self._lock = Lock()
+
+    def _stage(self, name: str) -> StageMetrics:
+        with self._lock:
+            return self._stages.setdefault(name, StageMetrics())
+
+    def _tracked(self, stage: str, func: Callable[[], T]) -> T:
+        metrics = self._stage(stage)
+        with self._lock:
+            metrics.queued -= 1
+            metrics.running += 1
+        started = time.perf_counter()
+        try:
+            return func()
+        finally:
+            with self._lock:
+                metrics.running -= 1
+                metrics.busy_seconds += time.perf_counter() - started
+
+    async def run_io(
+        self, stage: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Runs a blocking I/O-bound call on the shared thread pool."""
+        metrics = self._stage(stage)
+        with self._lock:
+            metrics.queued += 1
+            metrics.max_queued = max(metrics.max_queued, metrics.queued)
+        call = partial(self._tracked, stage, partial(func, *args, **kwargs))
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.io_executor, call
+            )
+        except Exception:
+            with self._lock:
+                metrics.failed += 1
+            raise
+        with self._lock:
+            metrics.completed += 1
+        return result
+
+    def metrics(self) -> dict[str, dict]:
+        """Returns a snapshot of the per-stage counters."""
+        with self._lock:
+            return {name: stage.as_dict() for name, stage in self._stages.items()}
+
+    def log_metrics(self) -> None:
+        for name, stage in self.metrics().items():
+            log.info(f"Ingest stage '{name}': {stage}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops both pools; pending work is cancelled, running work finishes if wait."""
+        self.io_executor.shutdown(wait=wait, cancel_futures=True)
+        self.cpu_executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@cache
+def get_ingest_runtime() -> IngestRuntime:
+    """Returns the process-wide ingestion runtime, creating it on first use."""
+    return IngestRuntime()
+
+
+def shutdown_ingest_runtime(wait: bool = True) -> None:
+    """Shuts the process-wide ingestion runtime down, if it was started."""
+    if get_ingest_runtime.cache_info().currsize:
+        get_ingest_runtime().shutdown(wait=wait)
+        get_ingest_runtime.cache_clear()
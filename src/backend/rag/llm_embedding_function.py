@@ -1,5 +1,6 @@
 from typing import Any
 import os
+from functools import cache
 
 from dotenv import load_dotenv
 import chromadb.utils.embedding_functions as embedding_functions
@@ -11,12 +12,13 @@ if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in environment variables")
 
 
+@cache
 def get_gemini_ef() -> Any:
     """
-    Returns a Google Gemini embedding function instance.
+    Returns the Google Gemini embedding function instance.
 
-    This function initializes and returns an instance of the Google Gemini
-    embedding function, which is used for generating embeddings for text data.
+    The instance is created on first use and shared by the whole process, as the
+    embedding function is stateless.
 
     Returns:
         embedding_functions.GoogleGenerativeAiEmbeddingFunction: An instance of the Google Gemini embedding function.
@@ -0,0 +1,156 @@
+import logging
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from backend.utils.atomic_write import atomic_path
+
+
+log = logging.getLogger("__name__")
+
+# Precision of the in-memory dense vectors: None keeps float32, "float16" halves and
+# "int8" quarters their memory at a small loss of recall (see measure_recall and
+# exp/quantized_recall.py)
+DENSE_QUANTIZATION: str | None = None
+QUANTIZATION_DTYPES = ("float16", "int8")
+# Directory inside the vector database holding one quantized sidecar per collection
+QUANTIZED_DIRNAME = "quantized"
+# Rows scored at once, bounding the temporary float32 copy of quantized vectors
+SCORE_BLOCK_ROWS = 4096
+
+
+class QuantizedVectors:
+    """
+    Unit-normalized dense vectors stored as float16 or int8.
+
+    int8 vectors are scaled per row (symmetric, max |value| -> 127), so scores only
+    need one multiplication per row to undo the scaling.
+
+    Args:
+        ids: Chunk ids, aligned with the rows.
+        data: Quantized rows.
+        scales: Per-row scale of int8 rows (None for float16).
+    """
+
+    def __init__(self, ids: list[str], data: np.ndarray, scales: Any = None) -> None:
+        self.ids = ids
+        self.data = data
+        self.scales = scales
+        self.dtype = str(data.dtype)
+
+    @classmethod
+    def from_embeddings(
+        cls, ids: list[str], embeddings: Any, dtype: str
+    ) -> "QuantizedVectors":
+        """Quantizes float vectors (rows are normalized first, scores are cosine)."""
+        if dtype not in QUANTIZATION_DTYPES:
+            raise ValueError(
+                f"Unknown quantization '{dtype}', expected one of {QUANTIZATION_DTYPES}"
+            )
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+        if dtype == "float16":
+            return cls(ids, matrix.astype(np.float16))
+        peaks = np.abs(matrix).max(axis=1)
+        scales = np.where(peaks == 0, 1.0, peaks / 127.0).astype(np.float32)
+        data = np.round(matrix / scales[:, None]).astype(np.int8)
+        return cls(ids, data, scales)
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.data.nbytes + (self.scales.nbytes if self.dtype == "int8" else 0)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def select(self, ids: list[str]) -> "QuantizedVectors":
+        """Returns the rows of the given ids, in that order (KeyError if one is missing)."""
+        position = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        rows = np.asarray([position[chunk_id] for chunk_id in ids], dtype=np.int64)
+        scales = self.scales[rows] if self.dtype == "int8" else None
+        return QuantizedVectors(list(ids), self.data[rows], scales)
+
+    def cosine_scores(self, query_embedding: Any) -> np.ndarray:
+        """Approximate cosine similarity of the query against every row."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self.data[start : start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[start : start + len(block)] = block @ query
+        if self.dtype == "int8":
+            scores *= self.scales
+        return scores
+
+
+def measure_recall(embeddings: Any, queries: Any, dtype: str, k: int = 10) -> float:
+    """
+    Recall@k of quantized search against exact float32 cosine search.
+
+    Args:
+        embeddings: Matrix of document vectors.
+        queries: Matrix of query vectors.
+        dtype: "float16" or "int8".
+        k: Number of nearest neighbours compared.
+
+    Returns:
+        Average fraction of the exact top-k also found in the quantized top-k.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    quantized = QuantizedVectors.from_embeddings(
+        [str(i) for i in range(len(matrix))], matrix, dtype
+    )
+    normalized = matrix / np.maximum(
+        np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12
+    )
+    k = min(k, len(matrix))
+    recalls = []
+    for query in np.asarray(queries, dtype=np.float32):
+        exact = set(np.argsort(-(normalized @ query))[:k])
+        approximate = set(np.argsort(-quantized.cosine_scores(query))[:k])
+        recalls.append(len(exact & approximate) / k)
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def _sidecar_path(db_path: str, name: str) -> Path:
+    return Path(db_path) / QUANTIZED_DIRNAME / f"{name}.npz"
+
+
+def save_quantized_index(db_path: str, name: str, vectors: QuantizedVectors) -> None:
+    """Persists the quantized vectors of a collection next to its Chroma index."""
+    # np.savez appends ".npz" to names without it
+    with atomic_path(_sidecar_path(db_path, name), suffix=".tmp.npz") as tmp_path:
+        np.savez(
+            tmp_path,
+            ids=np.asarray(vectors.ids, dtype=str),
+            data=vectors.data,
+            scales=vectors.scales if vectors.scales is not None else np.zeros(0),
+        )
+
+
+def load_quantized_index(
+    db_path: str, name: str, dtype: str
+) -> QuantizedVectors | None:
+    """Loads the quantized vectors of a collection, or None if missing or of another dtype."""
+    path = _sidecar_path(db_path, name)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as stored:
+            if str(stored["data"].dtype) != dtype:
+                return None
+            scales = stored["scales"] if dtype == "int8" else None
+            return QuantizedVectors(stored["ids"].tolist(), stored["data"], scales)
+    except (OSError, ValueError, KeyError) as e:
+        log.warning(f"Ignoring unreadable quantized index {path}: {e}")
+        return None
+
+
+def remove_quantized_index(db_path: str, name: str) -> None:
+    """Deletes the quantized vectors of a collection, e.g. after it changed."""
+    _sidecar_path(db_path, name).unlink(missing_ok=True)
@@ -1,13 +1,38 @@
+import argparse
 import asyncio
 import logging
+import time
 import traceback
+from collections.abc import Iterator
+from typing import Any
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 from chromadb import PersistentClient
 
-from backend.rag.create_chromadb import create_chroma_db
-from backend.utils.extract_text import extract_text_from_pdf
+from backend.rag.bm25_index import remove_bm25_index
+from backend.rag.call_embeddings import EMBEDDING_MODEL, embed_documents
+from backend.rag.chunking import CHUNKING_LAYOUT, chunk_page
+from backend.rag.collection_registry import get_collection_registry
+from backend.rag.create_chromadb import (
+    HNSW_CONSTRUCTION_EF,
+    HNSW_M,
+    HNSW_SEARCH_EF,
+    HNSW_SPACE,
+    finish_document_collection,
+    hnsw_metadata,
+    open_document_collection,
+)
+from backend.rag.ingest_runtime import get_ingest_runtime, shutdown_ingest_runtime
+from backend.rag.quantized_index import remove_quantized_index
+from backend.rag.ingest_manifest import (
+    commit_chunks,
+    get_entry,
+    mark_complete,
+    plan_ingest,
+    start_entry,
+)
+from backend.utils.file_hash import file_sha256
+from backend.utils.extract_text import iter_pdf_pages
 from backend.rag.vector_db_name_generation import (
     replace_polish_chars,
     generate_vector_db_document_name,
@@ -15,19 +40,27 @@ from backend.rag.vector_db_name_generation import (
 
 
 PDF_FILES = Path("scraped_files")
+CHROMA_DB_PATH = "chroma_vector_db"
 CHROMADB_MAX_FILENAME_LENGTH = 60
+# Chunks embedded and written together
+PIPELINE_BATCH_SIZE = 100
+# Bounds of the queues between stages (pages / batches), keeping memory flat
+PAGE_QUEUE_SIZE = 2 * PIPELINE_BATCH_SIZE
+BATCH_QUEUE_SIZE = 8
+# Embedding requests kept in flight (matches the embedding client's batch concurrency)
+EMBED_WORKERS = 4
 
 
 log = logging.getLogger("__name__")
 
-client = PersistentClient(path="chroma_vector_db")
+client = PersistentClient(path=CHROMA_DB_PATH)
 
 
 async def replace_polish_chars_async(text: str) -> str:
     """
     async version of function replace_polish_chars()
     """
-    return await run_in_executor(replace_polish_chars, text=text)  # type: ignore[no-any-return]
+    return await run_in_executor(replace_polish_chars, text=text, stage="naming")  # type: ignore[no-any-return]
 
 
 async def generate_vector_db_document_name_async(
@@ -36,69 +69,390 @@ async def generate_vector_db_document_name_async(
     """
     async version of function generate_vector_db_document_name
     """
-    return await run_in_executor(generate_vector_db_document_name, doc_path=doc_path, max_length=max_length)  # type: ignore[no-any-return]
+    return await run_in_executor(  # type: ignore[no-any-return]
+        generate_vector_db_document_name,
+        doc_path=doc_path,
+        max_length=max_length,
+        stage="naming",
+    )
 
 
-async def process_pdf(doc_path: Path) -> None:
+class _DocumentJob:
+    """State of one document travelling through the ingestion pipeline."""
+
+    def __init__(self, doc_path: Path, name: str, file_hash: str) -> None:
+        self.doc_path = doc_path
+        self.name = name
+        self.file_hash = file_hash
+        self.collection: Any = None
+        self.committed_ids: set[str] = set()
+        # ids written in this run, recorded in the manifest when the document is done
+        self.written_ids: list[str] = []
+        self.page_count = 0
+        self.batches_sent = 0
+        self.batches_written = 0
+        self.chunking_done = False
+        self.failed = False
+        self.finished = False
+        self.started = time.perf_counter()
+        self.embedding_seconds = 0.0
+
+    def fail(self, stage: str, error: Exception) -> None:
+        self.failed = True
+        log.error(f"Error processing {self.doc_path} ({stage}). Error message: {error}")
+        traceback.print_exc()
+
+
+class _Batch:
+    """Chunks of one document that are embedded and written together."""
+
+    def __init__(self, job: _DocumentJob) -> None:
+        self.job = job
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.metadatas: list[dict] = []
+        self.embeddings: list[list[float]] = []
+
+
+async def _plan_document(
+    doc_path: Path, hnsw: dict[str, Any] | None = None
+) -> _DocumentJob | None:
     """
-    Process a single PDF file asynchronously
+    Decides via the ingest manifest whether a document is skipped, resumed or rebuilt.
+
+    Args:
+        doc_path: The PDF to ingest.
+        hnsw: HNSW settings of a newly created collection, see hnsw_metadata.
+
+    Returns:
+        The job to run, or None when the collection is complete and up to date.
     """
-    try:
-        name = await generate_vector_db_document_name_async(
-            doc_path, max_length=CHROMADB_MAX_FILENAME_LENGTH
+    name = await generate_vector_db_document_name_async(
+        doc_path, max_length=CHROMADB_MAX_FILENAME_LENGTH
+    )
+    file_hash = await run_in_executor(file_sha256, doc_path, stage="hash")
+
+    # Check if collection exists (this might be a blocking operation)
+    existing_collections = await run_in_executor(
+        client.list_collections, stage="chroma"
+    )
+    existing = next(
+        (collection for collection in existing_collections if collection.name == name),
+        None,
+    )
+    collection_exists = existing is not None
+
+    entry = await run_in_executor(get_entry, CHROMA_DB_PATH, name, stage="manifest")
+    action = plan_ingest(
+        entry,
+        file_hash,
+        EMBEDDING_MODEL,
+        collection_exists,
+        chunking=CHUNKING_LAYOUT,
+        collection_metadata=existing.metadata if existing is not None else None,
+    )
+    if action == "skip":
+        log.info(f"Collection {name} is up to date. Skipping processing of {doc_path}.")
+        return None
+
+    if action == "rebuild" and collection_exists:
+        log.info(f"{doc_path} changed since it was embedded. Rebuilding {name}.")
+        await run_in_executor(_delete_collection, name, stage="chroma")
+
+    job = _DocumentJob(doc_path, name, file_hash)
+    job.collection = await run_in_executor(
+        open_document_collection, client, name, hnsw, stage="chroma"
+    )
+    if action == "resume":
+        stored = await run_in_executor(job.collection.get, include=[], stage="chroma")
+        job.committed_ids = set(stored["ids"])
+        log.info(f"Resuming {name}: {len(job.committed_ids)} chunks already stored.")
+
+    await run_in_executor(
+        start_entry,
+        CHROMA_DB_PATH,
+        name,
+        source=doc_path.name,
+        file_hash=file_hash,
+        page_count=entry["page_count"] if entry else 0,
+        embedding_model=EMBEDDING_MODEL,
+        chunk_ids=sorted(job.committed_ids),
+        chunking=CHUNKING_LAYOUT,
+        stage="manifest",
+    )
+    return job
+
+
+def _delete_collection(name: str) -> None:
+    """Deletes a collection with its keyword and quantized indexes."""
+    client.delete_collection(name)
+    remove_bm25_index(CHROMA_DB_PATH, name)
+    remove_quantized_index(CHROMA_DB_PATH, name)
+    get_collection_registry().invalidate(client, name)
+
+
+async def _extract_worker(
+    doc_queue: asyncio.Queue,
+    page_queue: asyncio.Queue,
+    hnsw: dict[str, Any] | None = None,
+) -> None:
+    """Stage 1: plans each document and streams its pages to the chunker."""
+    cpu_executor = get_ingest_runtime().cpu_executor
+    while (doc_path := await doc_queue.get()) is not None:
+        try:
+            job = await _plan_document(doc_path, hnsw)
+        except Exception as e:
+            log.error(f"Error processing {doc_path}. Error message: {e}")
+            traceback.print_exc()
+            continue
+        if job is None:
+            continue
+
+        pages: Iterator[tuple[int, str]] = iter_pdf_pages(
+            doc_path, executor=cpu_executor, file_hash=job.file_hash
         )
+        try:
+            while (
+                page := await run_in_executor(next, pages, None, stage="extract")
+            ) is not None:
+                await page_queue.put((job, page))
+        except Exception as e:
+            job.fail("extract", e)
+        await page_queue.put((job, None))
 
-        # Check if collection exists (this might be a blocking operation)
-        existing_collections = await run_in_executor(client.list_collections)
 
-        if any(collection.name == name for collection in existing_collections):
-            log.info(
-                f"Collection {name} already exists. Skipping processing of {doc_path}."
-            )
-            return
+async def _chunk_worker(page_queue: asyncio.Queue, batch_queue: asyncio.Queue) -> None:
+    """Stage 2: splits pages into chunks with stable ids and groups them into batches."""
+    open_batches: dict[str, _Batch] = {}
+    while (item := await page_queue.get()) is not None:
+        job, page = item
+        batch = open_batches.setdefault(job.name, _Batch(job))
 
-        text_list = await run_in_executor(extract_text_from_pdf, doc_path)
+        if page is not None:
+            page_number, text = page
+            chunks = chunk_page(job.page_count, page_number, text)
+            job.page_count += 1
+            for chunk in chunks:
+                if chunk.chunk_id in job.committed_ids or job.failed:
+                    continue
+                batch.ids.append(chunk.chunk_id)
+                batch.documents.append(chunk.text)
+                batch.metadatas.append(chunk.metadata)
+            if len(batch.ids) < PIPELINE_BATCH_SIZE:
+                continue
 
-        await run_in_executor(create_chroma_db, text_list, "chroma_vector_db", name)
+        del open_batches[job.name]
+        if batch.ids:
+            job.batches_sent += 1
+            await batch_queue.put(batch)
+        if page is None:
+            job.chunking_done = True
+            await _finish_if_done(job)
 
-        log.info(f"{doc_path} was embedded.")
 
-    except Exception as e:
-        log.error(f"Error processing {doc_path}. Error message: {e}")
-        traceback.print_exc()
+async def _embed_worker(batch_queue: asyncio.Queue, write_queue: asyncio.Queue) -> None:
+    """Stage 3: embeds batches through the shared (cached, coalescing) embedding client."""
+    while (batch := await batch_queue.get()) is not None:
+        if not batch.job.failed:
+            started = time.perf_counter()
+            try:
+                batch.embeddings = await run_in_executor(
+                    embed_documents, batch.documents, stage="embed"
+                )
+            except Exception as e:
+                batch.job.fail("embed", e)
+            batch.job.embedding_seconds += time.perf_counter() - started
+        await write_queue.put(batch)
 
 
-async def run_in_executor(func, *args, **kwargs):  # type: ignore[no-untyped-def]
+async def _write_worker(write_queue: asyncio.Queue) -> None:
+    """Stage 4: writes embedded batches to Chroma."""
+    while (batch := await write_queue.get()) is not None:
+        job = batch.job
+        if not job.failed:
+            try:
+                await run_in_executor(
+                    job.collection.add,
+                    documents=batch.documents,
+                    embeddings=batch.embeddings,
+                    ids=batch.ids,
+                    metadatas=batch.metadatas,
+                    stage="write",
+                )
+                job.written_ids += batch.ids
+                log.debug(
+                    f"Chunks {batch.ids[0]}-{batch.ids[-1]} of {job.name} stored."
+                )
+            except Exception as e:
+                job.fail("write", e)
+        job.batches_written += 1
+        await _finish_if_done(job)
+
+
+async def _finish_if_done(job: _DocumentJob) -> None:
+    """Finishes a document once it is chunked and all of its batches are written."""
+    if job.finished or not job.chunking_done or job.batches_written < job.batches_sent:
+        return
+    job.finished = True
+    await run_in_executor(_finish_document, job, stage="finish")
+
+
+def _finish_document(job: _DocumentJob) -> None:
+    """Refreshes the indexes of a written document and records it in the manifest."""
+    if job.failed or job.page_count == 0:
+        # the chunks that made it are kept, a later run resumes from them
+        if job.written_ids:
+            commit_chunks(CHROMA_DB_PATH, job.name, job.written_ids)
+        log.error(
+            f"{job.doc_path} was not fully embedded. Leaving {job.name} incomplete."
+        )
+        return
+    finish_document_collection(CHROMA_DB_PATH, client, job.collection)
+    mark_complete(
+        CHROMA_DB_PATH, job.name, page_count=job.page_count, chunk_ids=job.written_ids
+    )
+
+    elapsed = time.perf_counter() - job.started
+    embedded = len(job.written_ids)
+    log.info(
+        f"{job.doc_path} was embedded: {embedded} chunks of {job.page_count} pages in "
+        f"{elapsed:.2f}s ({job.page_count / max(elapsed, 1e-9):.2f} pages/sec, "
+        f"{embedded / max(job.embedding_seconds, 1e-9):.2f} embeddings/sec)."
+    )
+
+
+async def process_pdf(doc_path: Path) -> None:
+    """
+    Process a single PDF file asynchronously
+    """
+    await setup_chroma_db_async([doc_path], max_concurrency=1)
+
+
+async def run_in_executor(func, *args, stage: str = "misc", **kwargs):  # type: ignore[no-untyped-def]
     """
-    Run a blocking function in a thread pool executor
+    Run a blocking function on the shared ingestion thread pool, attributed to a stage
     """
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        return await loop.run_in_executor(executor, lambda: func(*args, **kwargs))
+    return await get_ingest_runtime().run_io(stage, func, *args, **kwargs)
 
 
-async def setup_chroma_db_async(doc_paths: list, max_concurrency: int = 4) -> None:
+async def setup_chroma_db_async(
+    doc_paths: list,
+    max_concurrency: int = 4,
+    space: str = HNSW_SPACE,
+    hnsw_m: int = HNSW_M,
+    construction_ef: int = HNSW_CONSTRUCTION_EF,
+    search_ef: int = HNSW_SEARCH_EF,
+) -> None:
     """
-    Process multiple PDF files concurrently with limited concurrency
+    Ingest PDF files through a streaming pipeline: extract -> chunk -> embed -> write.
+
+    Stages run concurrently and are connected by bounded queues, so extraction of one
+    document overlaps with embedding and writing of others and memory stays flat.
+    max_concurrency documents are extracted at the same time. The ingest manifest
+    decides per document whether it is skipped, resumed or rebuilt.
+
+    The HNSW settings apply to collections created by this run; existing collections
+    keep the settings they were created with.
+
+    Args:
+        doc_paths: PDF files to ingest.
+        max_concurrency: Number of documents extracted at the same time.
+        space: Distance metric of new collections ("cosine", "l2" or "ip").
+        hnsw_m: Number of neighbours per node of the HNSW graph.
+        construction_ef: Candidate list size while building the graph.
+        search_ef: Candidate list size while querying it.
     """
-    semaphore = asyncio.Semaphore(max_concurrency)
+    hnsw = hnsw_metadata(space, hnsw_m, construction_ef, search_ef)
+    doc_queue: asyncio.Queue = asyncio.Queue()
+    page_queue: asyncio.Queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+    batch_queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    queues = {"pages": page_queue, "batches": batch_queue, "writes": write_queue}
+    max_depth = dict.fromkeys(queues, 0)
+
+    for doc_path in doc_paths:
+        doc_queue.put_nowait(doc_path)
+    for _ in range(max_concurrency):
+        doc_queue.put_nowait(None)
+
+    extractors = [
+        asyncio.create_task(_extract_worker(doc_queue, page_queue, hnsw))
+        for _ in range(max_concurrency)
+    ]
+    chunker = asyncio.create_task(_chunk_worker(page_queue, batch_queue))
+    embedders = [
+        asyncio.create_task(_embed_worker(batch_queue, write_queue))
+        for _ in range(EMBED_WORKERS)
+    ]
+    writer = asyncio.create_task(_write_worker(write_queue))
+
+    async def sample_queue_depths() -> None:
+        while True:
+            for name, queue in queues.items():
+                max_depth[name] = max(max_depth[name], queue.qsize())
+            await asyncio.sleep(0.05)
 
-    async def process_with_semaphore(doc_path: Path) -> None:
-        async with semaphore:
-            await process_pdf(doc_path)
-            log.debug(f"{doc_path} was embedded into chromadb.")
+    async def close_stages() -> None:
+        # each stage is told to stop once every stage feeding it is done
+        await asyncio.gather(*extractors)
+        await page_queue.put(None)
+        await chunker
+        for _ in embedders:
+            await batch_queue.put(None)
+        await asyncio.gather(*embedders)
+        await write_queue.put(None)
+        await writer
 
-    tasks = [process_with_semaphore(pdf_file) for pdf_file in doc_paths]
-    await asyncio.gather(*tasks)
+    sampler = asyncio.create_task(sample_queue_depths())
+    tasks = [
+        *extractors,
+        chunker,
+        *embedders,
+        writer,
+        asyncio.create_task(close_stages()),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # a failing stage would leave the others waiting on their queues forever
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        sampler.cancel()
+
+    log.info(f"Ingest pipeline peak queue depths: {max_depth}")
+    get_ingest_runtime().log_metrics()
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        if PDF_FILES.is_dir():
+            pdf_files = list(PDF_FILES.glob("*.pdf"))
+            await setup_chroma_db_async(
+                pdf_files,
+                space=args.space,
+                hnsw_m=args.hnsw_m,
+                construction_ef=args.construction_ef,
+                search_ef=args.search_ef,
+            )
+        else:
+            log.error(f"The path {PDF_FILES} is not a directory.")
+    finally:
+        shutdown_ingest_runtime()
 
 
-async def main() -> None:
-    if PDF_FILES.is_dir():
-        pdf_files = list(PDF_FILES.glob("*.pdf"))
-        await setup_chroma_db_async(pdf_files)
-    else:
-        log.error(f"The path {PDF_FILES} is not a directory.")
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Ingest the scraped PDFs into the Chroma vector database."
+    )
+    parser.add_argument("--space", choices=["cosine", "l2", "ip"], default=HNSW_SPACE)
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M)
+    parser.add_argument("--construction-ef", type=int, default=HNSW_CONSTRUCTION_EF)
+    parser.add_argument("--search-ef", type=int, default=HNSW_SEARCH_EF)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
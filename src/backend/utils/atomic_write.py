@@ -0,0 +1,33 @@
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+
+@contextmanager
+def atomic_path(path: Path, suffix: str = ".tmp") -> Iterator[Path]:
+    """
+    Yields a temporary path next to path, which replaces path once it is written.
+
+    The rename is atomic, so a crash never leaves a truncated file behind; if writing
+    fails, path is left as it was and the temporary file is removed.
+
+    Args:
+        path: File to write.
+        suffix: Appended to the file name of the temporary file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + suffix)
+    try:
+        yield tmp_path
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_json_atomic(path: Path, data: Any, indent: int | None = 2) -> None:
+    """Writes data to a JSON file atomically, see atomic_path."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
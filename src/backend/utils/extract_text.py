@@ -1,19 +1,122 @@
+import os
+import time
 import traceback
 import logging
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
 
 import pdfplumber
 
+from backend.utils.extraction_cache import load_cached_pages, store_pages
+from backend.utils.file_hash import file_sha256
+
 
 log = logging.getLogger("__name__")
 
+# Number of worker processes used to extract large PDFs
+DEFAULT_EXTRACTION_WORKERS = os.cpu_count() or 1
+# PDFs shorter than this are extracted in the calling process
+PARALLEL_EXTRACTION_MIN_PAGES = 16
+# Page ranges handed to each worker per process (smaller ranges stream back sooner)
+TASKS_PER_WORKER = 4
+
+
+def _extract_page_range(pdf_path: Path, start: int, stop: int) -> list[tuple[int, str]]:
+    """Extracts pages [start, stop) of a PDF; runs inside a worker process."""
+    with pdfplumber.open(pdf_path) as pdf:
+        extracted = [(i + 1, pdf.pages[i].extract_text()) for i in range(start, stop)]
+    return [(page_number, text) for page_number, text in extracted if text]
+
+
+def iter_pdf_pages(
+    pdf_path: Path,
+    max_workers: int = DEFAULT_EXTRACTION_WORKERS,
+    executor: Executor | None = None,
+    file_hash: str | None = None,
+    use_cache: bool = True,
+) -> Iterator[tuple[int, str]]:
+    """
+    Extracts text page by page, splitting large PDFs into page ranges across processes.
+
+    Pages are yielded in document order as soon as the range containing them is done.
+    Pages without text (e.g. scans) are skipped. Results are cached on disk by file
+    content hash, so a PDF is parsed only once per extractor version.
+
+    Args:
+        pdf_path: PDF file to extract.
+        max_workers: Number of worker processes when no executor is given.
+        executor: Optional shared process pool, used for PDFs of any size. Without it,
+            short PDFs are extracted in-process and a pool is created for long ones.
+        file_hash: sha256 of the file, if the caller already computed it.
+        use_cache: Whether to read from and write to the extraction cache.
+
+    Yields:
+        (page_number, text) tuples, page numbers starting at 1.
+    """
+    if not use_cache:
+        yield from _extract_pages(pdf_path, max_workers, executor)
+        return
+
+    file_hash = file_hash or file_sha256(pdf_path)
+    cached_pages = load_cached_pages(file_hash)
+    if cached_pages is not None:
+        log.debug(f"Extraction cache hit for {pdf_path}.")
+        yield from cached_pages
+        return
+
+    pages = []
+    for page in _extract_pages(pdf_path, max_workers, executor):
+        pages.append(page)
+        yield page
+    store_pages(file_hash, pages)
+
+
+def _extract_pages(
+    pdf_path: Path, max_workers: int, executor: Executor | None
+) -> Iterator[tuple[int, str]]:
+    started = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+
+    if executor is None and (
+        page_count < PARALLEL_EXTRACTION_MIN_PAGES or max_workers < 2
+    ):
+        yield from _extract_page_range(pdf_path, 0, page_count)
+    else:
+        pool = executor or ProcessPoolExecutor(max_workers=max_workers)
+        workers = getattr(pool, "_max_workers", max_workers)
+        range_size = -(-page_count // (workers * TASKS_PER_WORKER))
+        try:
+            futures = [
+                pool.submit(
+                    _extract_page_range,
+                    pdf_path,
+                    start,
+                    min(start + range_size, page_count),
+                )
+                for start in range(0, page_count, range_size)
+            ]
+            for future in futures:
+                yield from future.result()
+        finally:
+            if executor is None:
+                pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        f"Extracted {page_count} pages of {pdf_path} in {elapsed:.2f}s "
+        f"({page_count / max(elapsed, 1e-9):.2f} pages/sec)."
+    )
+
 
-def extract_text_from_pdf(pdf_path: Path):  # type: ignore
+def extract_text_from_pdf(pdf_path: Path, max_workers: int = DEFAULT_EXTRACTION_WORKERS):  # type: ignore
     """Extracts text from a PDF file.
 
     This function reads a PDF file, extracts text from each page, and concatenates
     the extracted text into a single string. If an error occurs during extraction,
-    it logs the error and returns an empty string.
+    it logs the error and returns an empty string. Large PDFs are extracted in
+    parallel page ranges (see iter_pdf_pages).
 
     Examples:
         >>> extract_text_from_pdf(Path("document.pdf"))
@@ -21,6 +124,7 @@ def extract_text_from_pdf(pdf_path: Path):  # type: ignore
 
     Args:
         pdf_path: A Path object representing the PDF file to extract text from.
+        max_workers: Number of worker processes used for large PDFs.
 
     Returns:
         A string containing the extracted text from the PDF. If an error occurs,
@@ -32,13 +136,7 @@ def extract_text_from_pdf(pdf_path: Path):  # type: ignore
     """
 
     try:
-        pages_list = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:  # some pages may return None
-                    pages_list.append(page_text)
-        return pages_list
+        return [page_text for _, page_text in iter_pdf_pages(pdf_path, max_workers)]
 
     except Exception as e:
         log.error(f"Error processing {pdf_path}: {str(e)}")
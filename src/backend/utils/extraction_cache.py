@@ -0,0 +1,63 @@
+import gzip
+import json
+import logging
+from pathlib import Path
+
+import pdfplumber
+
+from backend.utils.atomic_write import atomic_path
+from backend.utils.paths import CACHE_DIR
+
+
+log = logging.getLogger("__name__")
+
+EXTRACTION_CACHE_DIR = CACHE_DIR / "extraction"
+# Bump the suffix whenever extraction output changes, so stale entries are not reused
+EXTRACTOR_VERSION = f"pdfplumber-{pdfplumber.__version__}-1"
+
+
+def _cache_path(file_hash: str) -> Path:
+    return EXTRACTION_CACHE_DIR / f"{file_hash}-{EXTRACTOR_VERSION}.jsonl.gz"
+
+
+def load_cached_pages(file_hash: str) -> list[tuple[int, str]] | None:
+    """
+    Returns the extracted pages of a PDF if they are in the extraction cache.
+
+    Args:
+        file_hash: sha256 of the PDF content.
+
+    Returns:
+        List of (page_number, text) tuples, or None on a cache miss.
+    """
+    path = _cache_path(file_hash)
+    if not path.exists():
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            pages = [json.loads(line) for line in f]
+        return [(page["page_number"], page["text"]) for page in pages]
+    except (OSError, ValueError, KeyError) as e:
+        log.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+        return None
+
+
+def store_pages(file_hash: str, pages: list[tuple[int, str]]) -> None:
+    """
+    Writes the extracted pages of a PDF to the extraction cache as gzipped JSON lines.
+
+    Args:
+        file_hash: sha256 of the PDF content.
+        pages: List of (page_number, text) tuples.
+    """
+    path = _cache_path(file_hash)
+    with atomic_path(path) as tmp_path:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for page_number, text in pages:
+                f.write(
+                    json.dumps(
+                        {"page_number": page_number, "text": text}, ensure_ascii=False
+                    )
+                    + "\n"
+                )
+    log.debug(f"Stored {len(pages)} extracted pages in {path}.")
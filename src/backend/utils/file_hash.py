@@ -0,0 +1,20 @@
+import hashlib
+from pathlib import Path
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the sha256 hex digest of a file's content.
+
+    Args:
+        path: File to hash.
+        chunk_size: Number of bytes read at a time.
+
+    Returns:
+        The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
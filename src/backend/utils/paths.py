@@ -0,0 +1,11 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+# Root of all on-disk caches (embeddings, extracted text, uploads, Flask-Caching);
+# KNF_CACHE_DIR moves it, e.g. to a faster or shared disk
+CACHE_DIR = Path(os.getenv("KNF_CACHE_DIR", str(PROJECT_ROOT / "cache")))
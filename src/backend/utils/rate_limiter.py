@@ -0,0 +1,168 @@
+import time
+import random
+import logging
+from collections.abc import Callable
+from threading import Lock
+from typing import Any, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+
+
+log = logging.getLogger("__name__")
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Callers block in
+    acquire() only when the bucket is empty, so bursts up to capacity go through
+    immediately and sustained traffic is held at the configured rate.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens the bucket holds (burst size).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Token bucket rate and capacity must be positive.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Takes tokens from the bucket, going into debt if needed.
+
+        Returns:
+            Number of seconds the caller has to wait before the reserved tokens are valid.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Blocks until the requested number of tokens is available."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            log.debug(f"Rate limit reached, waiting {wait:.2f}s.")
+            time.sleep(wait)
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """Tells whether an API error is a rate limit / quota (HTTP 429) error."""
+    if isinstance(
+        error, google_exceptions.ResourceExhausted | google_exceptions.TooManyRequests
+    ):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+class AdaptiveThrottle:
+    """
+    Retries calls on quota errors with exponential backoff and full jitter.
+
+    Calls go through without any delay while the API accepts them. After a 429 the
+    throttle keeps a shared penalty, so every caller slows down until requests succeed
+    again; each success halves the penalty.
+
+    Args:
+        base_delay: Backoff after the first quota error, in seconds.
+        max_delay: Upper bound for the backoff, in seconds.
+        max_retries: Number of retries before the quota error is raised.
+    """
+
+    def __init__(
+        self, base_delay: float = 1.0, max_delay: float = 60.0, max_retries: int = 6
+    ) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._penalty = 0.0
+        self._lock = Lock()
+
+    def _on_success(self) -> None:
+        with self._lock:
+            self._penalty = (
+                self._penalty / 2 if self._penalty >= self.base_delay else 0.0
+            )
+
+    def _on_quota_error(self) -> float:
+        with self._lock:
+            self._penalty = min(self.max_delay, max(self.base_delay, self._penalty * 2))
+            return self._penalty
+
+    def call(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Calls func, backing off and retrying only when it fails with a quota error."""
+        with self._lock:
+            penalty = self._penalty
+        if penalty:
+            time.sleep(random.uniform(0, penalty))
+
+        attempt = 0
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                if not is_quota_error(e) or attempt > self.max_retries:
+                    raise
+                delay = random.uniform(0, self._on_quota_error())
+                log.warning(
+                    f"Quota error (attempt {attempt}/{self.max_retries}), "
+                    f"backing off {delay:.2f}s: {e}"
+                )
+                time.sleep(delay)
+            else:
+                self._on_success()
+                return result
+
+
+class RequestScheduler:
+    """
+    Shared admission control for API requests, keyed by quota.
+
+    Every quota key (e.g. a model name) gets its own token bucket and adaptive throttle,
+    shared by all threads of the process. Requests are admitted immediately while the
+    quota has room and only wait when it is exhausted or the API reported a 429, so
+    callers no longer need fixed sleeps to stay under the rate limit.
+
+    Args:
+        requests_per_minute: Sustained request rate allowed per quota key.
+        burst: Number of requests that may be sent at once; defaults to a second's worth.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: float | None = None) -> None:
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or max(1.0, self.rate)
+        self._quotas: dict[str, tuple[TokenBucket, AdaptiveThrottle]] = {}
+        self._lock = Lock()
+
+    def _quota(self, key: str) -> tuple[TokenBucket, AdaptiveThrottle]:
+        with self._lock:
+            if key not in self._quotas:
+                self._quotas[key] = (
+                    TokenBucket(rate=self.rate, capacity=self.capacity),
+                    AdaptiveThrottle(),
+                )
+            return self._quotas[key]
+
+    def call(self, key: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Calls func once the quota identified by key admits another request."""
+        bucket, throttle = self._quota(key)
+        bucket.acquire()
+        return throttle.call(func, *args, **kwargs)
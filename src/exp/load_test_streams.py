@@ -0,0 +1,134 @@
+"""
+Load test for the Socket.IO streaming endpoint.
+
+Opens N simultaneous clients against a running server, starts a document query on
+each and reports time to first chunk and total stream time per client. Each client
+sends a unique prompt, so answers are generated rather than replayed from the answer
+cache (--cached measures cache replay instead).
+
+Needs the Socket.IO client: uv sync --extra loadtest
+
+Usage (server started separately, e.g. SOCKETIO_ASYNC_MODE=gevent python run.py):
+    python exp/load_test_streams.py --clients 20 --files KNF_2022_01.pdf
+"""
+
+import argparse
+import copy
+import statistics
+import threading
+import time
+import uuid
+
+import socketio  # type: ignore[import-untyped]
+
+
+def run_client(url: str, form: dict, timeout: float, results: list[dict]) -> None:
+    """Runs one streamed query and appends its timings to results."""
+    client = socketio.Client()
+    done = threading.Event()
+    timings: dict = {"first_chunk": None, "chunks": 0, "errors": []}
+
+    @client.on("append_content")
+    def on_append(data: dict) -> None:
+        if timings["first_chunk"] is None:
+            timings["first_chunk"] = time.perf_counter() - started
+        timings["chunks"] += 1
+
+    @client.on("update_content")
+    def on_update(data: dict) -> None:
+        # answers replayed from the answer cache arrive whole, without deltas
+        if timings["first_chunk"] is None:
+            timings["first_chunk"] = time.perf_counter() - started
+
+    @client.on("error")
+    def on_error(data: dict) -> None:
+        timings["errors"].append(data.get("message"))
+
+    @client.on("stream_stopped")
+    def on_stopped(*args: object) -> None:
+        done.set()
+
+    client.connect(url)
+    started = time.perf_counter()
+    client.emit("start_processing", form)
+    finished = done.wait(timeout)
+    timings["total"] = time.perf_counter() - started
+    timings["timed_out"] = not finished
+    client.disconnect()
+    results.append(timings)
+
+
+def _summary(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (
+        f"min {values[0]:.2f}s, median {statistics.median(values):.2f}s, "
+        f"p95 {p95:.2f}s, max {values[-1]:.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--files", nargs="+", required=True)
+    parser.add_argument("--prompt", default="Podsumuj najważniejsze wymagania.")
+    parser.add_argument("--model", default="gemini-2.0-flash")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Send the same prompt from every client (measures answer cache replay)",
+    )
+    args = parser.parse_args()
+
+    form = {
+        "input": args.prompt,
+        "pdfFiles": args.files,
+        "choosen_model": args.model,
+        "output_size": "medium",
+        "show_pages_checkbox": False,
+        "change_length_checkbox": False,
+        "ragDocSlider": False,
+        "prompt_enhancer": False,
+    }
+    run_id = uuid.uuid4().hex[:8]
+    forms = []
+    for index in range(args.clients):
+        client_form = copy.deepcopy(form)
+        if not args.cached:
+            client_form["input"] = f"{args.prompt} (load test {run_id}-{index})"
+        forms.append(client_form)
+    results: list[dict] = []
+    threads = [
+        threading.Thread(
+            target=run_client, args=(args.url, client_form, args.timeout, results)
+        )
+        for client_form in forms
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    completed = [r for r in results if not r["timed_out"] and not r["errors"]]
+    print(f"{args.clients} simultaneous streams, wall time {wall:.2f}s")
+    print(
+        f"completed: {len(completed)}, with errors: {sum(bool(r['errors']) for r in results)}"
+    )
+    print(f"timed out: {sum(r['timed_out'] for r in results)}")
+    print(
+        "time to first chunk: "
+        + _summary(
+            [r["first_chunk"] for r in completed if r["first_chunk"] is not None]
+        )
+    )
+    print("total stream time: " + _summary([r["total"] for r in completed]))
+
+
+if __name__ == "__main__":
+    main()
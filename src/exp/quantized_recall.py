@@ -0,0 +1,134 @@
+"""
+Recall of quantized and HNSW dense search against exact float32 search.
+
+For every collection of a vector database, stored chunk vectors (slightly perturbed)
+are used as queries. The script reports recall@k, memory and scoring time of
+float16 / int8 vectors (see backend/rag/quantized_index.py) and recall of Chroma's
+HNSW index with the collection's settings (see create_chromadb.hnsw_metadata).
+
+Usage (from src/):
+    python -m exp.quantized_recall --db ../chroma_vector_db --queries 50 --k 10
+    python -m exp.quantized_recall --synthetic 20000
+"""
+
+import argparse
+import time
+
+import chromadb
+import numpy as np
+
+from backend.rag.quantized_index import QUANTIZATION_DTYPES, QuantizedVectors
+
+
+def _exact_top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> list[set]:
+    normalized = matrix / np.maximum(
+        np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12
+    )
+    return [set(np.argsort(-(normalized @ query))[:k]) for query in queries]
+
+
+def _queries(matrix: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    picked = matrix[
+        rng.choice(len(matrix), size=min(count, len(matrix)), replace=False)
+    ]
+    noise = rng.normal(scale=0.02, size=picked.shape).astype(np.float32)
+    return picked + noise
+
+
+def evaluate(
+    name: str,
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    collection: chromadb.Collection | None = None,
+) -> None:
+    """Prints recall@k, memory and scoring time of each precision for one matrix."""
+    exact = _exact_top_k(matrix, queries, k)
+    ids = [str(i) for i in range(len(matrix))]
+    print(f"\n{name}: {len(matrix)} vectors x {matrix.shape[1]} dims, recall@{k}")
+
+    started = time.perf_counter()
+    for query in queries:
+        matrix @ query
+    seconds = (time.perf_counter() - started) / len(queries)
+    print(
+        f"  float32  recall 1.000  {matrix.nbytes / 2**20:8.2f} MiB  "
+        f"{seconds * 1000:7.3f} ms/query"
+    )
+
+    for dtype in QUANTIZATION_DTYPES:
+        vectors = QuantizedVectors.from_embeddings(ids, matrix, dtype)
+        started = time.perf_counter()
+        found = [vectors.cosine_scores(query) for query in queries]
+        seconds = (time.perf_counter() - started) / len(queries)
+        recall = np.mean(
+            [
+                len(set(np.argsort(-scores)[:k]) & truth) / k
+                for scores, truth in zip(found, exact)
+            ]
+        )
+        print(
+            f"  {dtype:8} recall {recall:.3f}  {vectors.nbytes / 2**20:8.2f} MiB  "
+            f"{seconds * 1000:7.3f} ms/query"
+        )
+
+    if collection is not None:
+        stored_ids = collection.get(include=[])["ids"]
+        started = time.perf_counter()
+        results = collection.query(query_embeddings=list(queries), n_results=k)
+        seconds = (time.perf_counter() - started) / len(queries)
+        position = {chunk_id: i for i, chunk_id in enumerate(stored_ids)}
+        recall = np.mean(
+            [
+                len({position[chunk_id] for chunk_id in hits} & truth) / k
+                for hits, truth in zip(results["ids"], exact)
+            ]
+        )
+        settings = {
+            key: value
+            for key, value in (collection.metadata or {}).items()
+            if key.startswith("hnsw:")
+        }
+        print(
+            f"  hnsw     recall {recall:.3f}  {'':8}      "
+            f"{seconds * 1000:7.3f} ms/query  {settings or 'chroma defaults'}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", help="Path of the Chroma vector database")
+    parser.add_argument(
+        "--synthetic", type=int, help="Evaluate N random 768-dim vectors instead"
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    if args.synthetic:
+        matrix = rng.normal(size=(args.synthetic, 768)).astype(np.float32)
+        evaluate("synthetic", matrix, _queries(matrix, args.queries, rng), args.k)
+        return
+    if not args.db:
+        parser.error("either --db or --synthetic is required")
+
+    client = chromadb.PersistentClient(path=args.db)
+    for listed in client.list_collections():
+        collection = client.get_collection(listed.name)
+        data = collection.get(include=["embeddings"])
+        matrix = np.asarray(data["embeddings"], dtype=np.float32)
+        if len(matrix) <= args.k:
+            continue
+        evaluate(
+            listed.name,
+            matrix,
+            _queries(matrix, args.queries, rng),
+            args.k,
+            collection,
+        )
+
+
+if __name__ == "__main__":
+    main()
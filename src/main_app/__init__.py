@@ -1,10 +1,12 @@
 import logging
 from pathlib import Path
+from threading import BoundedSemaphore
 
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_caching import Cache
 
+from backend.chatbot.file_upload_cache import get_upload_cache
 from backend.utils.custom_logger import CustomFormatter
 from backend.rag.chroma_instance import get_chroma_client
 from .config import Config
@@ -32,10 +34,22 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     Path(app.config["CACHE_DIR"]).mkdir(parents=True, exist_ok=True)
 
     # Initialize extensions with the app
-    socketio.init_app(app)
+    socketio.init_app(app, async_mode=app.config["SOCKETIO_ASYNC_MODE"])
     cache.init_app(app)
+    # created once here: a lazily created semaphore could be replaced by a concurrent
+    # first request, and releases would then go to the wrong one
+    app.extensions["stream_slots"] = BoundedSemaphore(
+        app.config["MAX_CONCURRENT_STREAMS"]
+    )
 
     log.info("Vector DB initialized")
+    log.info(
+        f"Socket.IO async mode: {app.config['SOCKETIO_ASYNC_MODE']}, "
+        f"max concurrent streams: {app.config['MAX_CONCURRENT_STREAMS']}"
+    )
+
+    # keep the most-used documents uploaded for full-document mode
+    get_upload_cache().start_prewarmer()
 
     # Register Blueprints
     from . import routes
@@ -1,15 +1,14 @@
 import os
 import json
-from pathlib import Path
 
 from dotenv import load_dotenv
 
+from backend.utils.paths import CACHE_DIR, PROJECT_ROOT
+
 load_dotenv()
 
 # --- Project Paths ---
-PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 CONFIG_PATH = PROJECT_ROOT / "src" / "config" / "config.json"
-CACHE_DIR = PROJECT_ROOT / "cache"
 CHROMA_CLIENT_DIR = str(PROJECT_ROOT / "chroma_vector_db")
 SCRAPED_FILES_DIR = PROJECT_ROOT / "scraped_files"
 
@@ -34,8 +33,26 @@ class Config:
     CHROMA_CLIENT_DIR = CHROMA_CLIENT_DIR
     CHROMADB_MAX_FILENAME_LENGTH = 60
 
+    # --- Serving Settings ---
+    # "threading" (default), "gevent" or "eventlet"; cooperative modes need the
+    # matching package installed and are monkey patched in run.py
+    SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+    # Streaming requests (document queries and chat messages) served at the same time
+    MAX_CONCURRENT_STREAMS = int(os.getenv("MAX_CONCURRENT_STREAMS", "16"))
+    # How long a request waits for a free stream slot before the client is told to retry
+    STREAM_SLOT_TIMEOUT_SECONDS = float(os.getenv("STREAM_SLOT_TIMEOUT_SECONDS", "30"))
+
+    # --- Query Settings ---
+    # Documents of a multi-document question processed concurrently
+    MAX_PARALLEL_DOCUMENTS = int(os.getenv("MAX_PARALLEL_DOCUMENTS", "4"))
+
     # --- Caching ---
-    CACHE_DIR = CACHE_DIR
+    # Keep chat documents in Gemini cached contexts between turns (opt-in, cache
+    # storage is billed per hour)
+    GEMINI_CONTEXT_CACHING = os.getenv("GEMINI_CONTEXT_CACHING", "False") == "True"
+    # Flask-Caching prunes every file of its directory, so it gets one of its own
+    # next to the other caches (embeddings, extracted text, uploads)
+    CACHE_DIR = CACHE_DIR / "flask"
     CACHE_TYPE = "FileSystemCache"
     CACHE_THRESHOLD = 500
 
@@ -1,7 +1,10 @@
 # main_app/events.py
 import traceback
+from contextlib import closing
 
-from flask import request
+from threading import BoundedSemaphore
+
+from flask import current_app, request
 from flask_socketio import emit
 
 from . import socketio, cache, log
@@ -10,6 +13,24 @@ from .services import process_document_query, process_chat_query
 session_state = {}
 
 
+def _get_stream_slots() -> BoundedSemaphore:
+    """Returns the semaphore limiting concurrent streams, created by create_app."""
+    slots: BoundedSemaphore = current_app.extensions["stream_slots"]
+    return slots
+
+
+def _acquire_stream_slot(sid: str) -> bool:
+    """Waits for a free stream slot; tells the client the server is busy on timeout."""
+    if _get_stream_slots().acquire(
+        timeout=current_app.config["STREAM_SLOT_TIMEOUT_SECONDS"]
+    ):
+        return True
+    log.warning(f"No free stream slot for SID: {sid}")
+    emit("error", {"message": "Server is busy, please try again in a moment."})
+    emit("stream_stopped")
+    return False
+
+
 @socketio.on("connect")
 def handle_connect() -> None:
     """
@@ -85,26 +106,35 @@ def handle_start_processing(data: dict) -> None:
     if sid not in session_state:
         handle_connect()
 
+    if not _acquire_stream_slot(sid):
+        return
     session_state[sid]["streaming"] = True
     print("session state: ", session_state)
     log.info(f"Started processing for SID: {sid}")
 
     try:
-        for result in process_document_query(data, sid):
-            if not session_state.get(sid, {}).get("streaming", False):
-                log.info(f"Stream manually stopped for SID: {sid}")
-                break
-
-            event = result.get("event")
-            payload = result.get("payload")
-            if event and payload is not None:
-                emit(event, payload)
+        # closing() makes a stop cancel the service's in-flight document workers at once
+        def should_stop() -> bool:
+            return not session_state.get(sid, {}).get("streaming", False)
+
+        with closing(process_document_query(data, sid, should_stop)) as results:
+            for result in results:
+                if should_stop():
+                    log.info(f"Stream manually stopped for SID: {sid}")
+                    break
+
+                event = result.get("event")
+                payload = result.get("payload")
+                if event and payload is not None:
+                    emit(event, payload)
+                    socketio.sleep(0)  # lets other clients run in cooperative modes
 
     except Exception as e:
         log.error(f"Error during start_processing for SID {sid}: {e}")
         traceback.print_exc()
         emit("error", {"message": f"An unexpected error occurred: {str(e)}"})
     finally:
+        _get_stream_slots().release()
         if sid in session_state:
             session_state[sid]["streaming"] = False
         emit("stream_stopped")
@@ -122,6 +152,8 @@ def handle_chat_message(data: dict) -> None:
         handle_connect()
 
     print("SID: ", sid)
+    if not _acquire_stream_slot(sid):
+        return
     session_state[sid]["streaming"] = True
     print("Session state: ", session_state)
     log.info(f"Chat message received from SID: {sid}")
@@ -135,12 +167,14 @@ def handle_chat_message(data: dict) -> None:
             payload = result.get("payload")
             if event and payload is not None:
                 emit(event, payload)
+                socketio.sleep(0)
 
     except Exception as e:
         log.error(f"Error during send_chat_message for SID {sid}: {e}")
         traceback.print_exc()
         emit("error", {"message": f"An unexpected error occurred: {str(e)}"})
     finally:
+        _get_stream_slots().release()
         if sid in session_state:
             session_state[sid]["streaming"] = False
         emit("stream_stopped")
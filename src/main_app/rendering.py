@@ -0,0 +1,72 @@
+import re
+
+import markdown
+
+FENCE_PATTERN = re.compile(r"^ {0,3}(```|~~~)")
+LIST_ITEM_PATTERN = re.compile(r"^ {0,3}([-*+]|\d+[.)])(\s|$)")
+
+
+class IncrementalMarkdownRenderer:
+    """
+    Renders a streamed markdown answer block by block.
+
+    Text is split into blocks at blank lines. Once a block is followed by the start of
+    a new top-level block it can no longer change, so it is rendered once and never
+    again; only the trailing open block is re-rendered when a chunk arrives. Blank
+    lines inside code fences, before indented continuations and between list items
+    (loose lists) are not treated as block boundaries.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._committed = 0  # text[:_committed] has been rendered and sent
+
+    def feed(self, chunk: str) -> tuple[str, str]:
+        """
+        Adds a streamed chunk.
+
+        Args:
+            chunk: Next piece of the markdown answer.
+
+        Returns:
+            A tuple (html, tail_html): html of blocks closed by this chunk (to be
+            appended) and html of the still open trailing block (to be replaced).
+        """
+        self.text += chunk
+        boundary = self._stable_boundary()
+        html = ""
+        if boundary > self._committed:
+            html = markdown.markdown(self.text[self._committed : boundary])
+            self._committed = boundary
+        return html, markdown.markdown(self.text[self._committed :])
+
+    def render_full(self) -> str:
+        """Renders the whole answer at once, e.g. for caching the final result."""
+        return markdown.markdown(self.text)
+
+    def _stable_boundary(self) -> int:
+        """Returns the offset of the last block start that closes all blocks before it."""
+        boundary = offset = self._committed
+        in_fence = False
+        previous_blank = False
+        block_has_list = False
+        # only complete lines are considered, the last line may still grow
+        for line in self.text[self._committed :].split("\n")[:-1]:
+            blank = not line.strip()
+            if in_fence:
+                in_fence = not FENCE_PATTERN.match(line)
+            elif not blank:
+                list_item = bool(LIST_ITEM_PATTERN.match(line))
+                indented = line[:1] in (" ", "\t")
+                if (
+                    previous_blank
+                    and not indented
+                    and not (list_item and block_has_list)
+                ):
+                    boundary = offset
+                    block_has_list = False
+                block_has_list = block_has_list or list_item
+                in_fence = bool(FENCE_PATTERN.match(line))
+            previous_blank = blank and not in_fence
+            offset += len(line) + 1
+        return boundary
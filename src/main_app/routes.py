@@ -1,11 +1,26 @@
 from pathlib import Path
 
 import markdown
-from flask import Blueprint, render_template, request, send_from_directory, current_app
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    send_from_directory,
+    current_app,
+    jsonify,
+)
 from werkzeug.wrappers import Response
 
+from backend.chatbot.answer_cache import get_answer_cache
+from backend.rag.corpus_search import (
+    CORPUS_MAX_TOP_K,
+    CORPUS_TOP_K,
+    list_corpus_documents,
+    search_corpus,
+)
+from backend.rag.embedding_cache import get_embedding_cache
 from backend.rag.vector_db_name_generation import extract_title_from_filename
-from . import cache, log
+from . import cache, chroma_client, log
 
 main_bp = Blueprint("main", __name__)
 
@@ -27,6 +42,48 @@ def serve_file(filename: str) -> Response:
     return send_from_directory(current_app.config["PDF_DIRECTORY"], filename)
 
 
+@main_bp.route("/stats/cache")
+def cache_stats() -> Response:
+    """Returns hit rates of the answer and embedding caches as JSON."""
+    return jsonify(
+        {
+            "answer_cache": get_answer_cache().stats(),
+            "embedding_cache": get_embedding_cache().stats(),
+        }
+    )
+
+
+@main_bp.route("/search/corpus")
+def corpus_search() -> tuple[Response, int] | Response:
+    """
+    Searches all documents of the corpus at once, e.g. "which recommendations
+    mention X".
+
+    Query parameters: q (the query) and optionally k (number of passages kept,
+    a positive integer capped at CORPUS_MAX_TOP_K).
+
+    Returns:
+        JSON with the matching documents (ID, title, passages with page numbers),
+        the search time and its latency target.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    try:
+        top_k = int(request.args.get("k", CORPUS_TOP_K))
+    except ValueError:
+        return jsonify({"error": "Query parameter 'k' must be an integer"}), 400
+    if top_k < 1:
+        return jsonify({"error": "Query parameter 'k' must be positive"}), 400
+    top_k = min(top_k, CORPUS_MAX_TOP_K)
+    documents = list_corpus_documents(
+        Path(current_app.config["PDF_DIRECTORY"]),
+        chroma_client,
+        max_length=current_app.config["CHROMADB_MAX_FILENAME_LENGTH"],
+    )
+    return jsonify(search_corpus(query, chroma_client, documents, top_k=top_k))
+
+
 @main_bp.route("/documentChat")
 def document_chat() -> str:
     """Serves the document chat page using cached content based on the provided content ID.
@@ -1,38 +1,64 @@
+import queue
+import threading
 import traceback
-from collections.abc import Iterator
+from collections.abc import Callable, Generator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-import markdown
 import uuid
 from flask import render_template, current_app
 import google.generativeai as genai
 
 from . import chroma_client, cache, log
+from .rendering import IncrementalMarkdownRenderer
+from backend.chatbot.answer_cache import get_answer_cache
+from backend.chatbot.prompt_enhancer import enhance_prompt_async
 from backend.chatbot.show_pages import show_pages
 from backend.chatbot.process_query import (
     process_query_with_rag,
     process_chat_query_with_rag,
 )
+from backend.rag.collection_registry import get_collection_registry
 from backend.rag.vector_db_name_generation import (
     generate_vector_db_document_name,
     extract_title_from_filename,
 )
 
+# How often a waiting multi-document query checks whether it was stopped
+STOP_POLL_SECONDS = 0.1
+# Distinct (model, system instruction) pairs whose model objects are kept
+MODEL_CACHE_SIZE = 16
+
+
+@lru_cache(maxsize=1)
+def _configure_genai(api_key: str) -> None:
+    """Configures the GenerativeAI client once per process (and API key)."""
+    genai.configure(api_key=api_key)
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _cached_model(model_name: str, system_instruction: str) -> genai.GenerativeModel:
+    """Returns a shared model object; GenerativeModel holds no per-request state."""
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
 
 def _get_model(data: dict) -> genai.GenerativeModel:
     """Helper function to configure and return a GenerativeAI model."""
     choosen_model = str(data.get("choosen_model", "gemini-2.0-flash"))
     show_pages_checkbox = str(data.get("show_pages_checkbox"))
 
-    genai.configure(api_key=current_app.config["GEMINI_API_KEY"])
+    _configure_genai(current_app.config["GEMINI_API_KEY"])
 
     system_instruction = show_pages(
         current_app.config["SYSTEM_PROMPT"], show_pages_checkbox
     )
 
-    return genai.GenerativeModel(choosen_model, system_instruction=system_instruction)
+    return _cached_model(choosen_model, system_instruction)
 
 
-def process_document_query(data: dict, sid: str) -> Iterator[dict]:
+def process_document_query(
+    data: dict, sid: str, should_stop: Callable[[], bool] | None = None
+) -> Generator[dict, None, None]:
     """
     Generator function that processes a query against multiple documents and yields results.
     Handles the initial processing of user input and selected PDFs using a generative model.
@@ -40,6 +66,12 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
     This function is triggered via a Socket.IO event when a user initiates processing.
     It validates the input prompt and selected PDF files, sets up the selected
     Gemini model, and processes each PDF using retrieval-augmented generation (RAG).
+    Documents are processed concurrently (up to MAX_PARALLEL_DOCUMENTS at a time) and
+    their chunks are interleaved, each into its own container, as they arrive. When
+    the caller stops consuming the generator (e.g. on "stop_processing") all in-flight
+    work is cancelled. Answers are kept in the answer cache; a repeated (or, by
+    embedding similarity, near-identical) question with the same settings is replayed
+    from it without retrieval or generation.
     The response is streamed back to the client in real time, rendered in markdown,
     and cached for future access.
 
@@ -69,11 +101,16 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
             - "temperature_slider_value": Float controlling verbosity or detail (str or float).
             - "ragDocSlider": Toggle between RAG and document mode (str).
             - Other UI flags or settings.
+        sid: Socket.IO session id of the client.
+        should_stop: Optional callable telling whether the client stopped processing;
+            checked while waiting for chunks so idle workers are cancelled promptly.
 
     Returns:
         None. Results are streamed to the client via Socket.IO events:
             - "new_container": Sends a new HTML container for each PDF.
-            - "update_content": Streams chunks of the model's response.
+            - "append_content": Streams the model's response as html deltas: newly
+              closed markdown blocks to append and the re-rendered open trailing block.
+            - "update_content": Sends the full rendered response once it is complete.
             - "processing_complete_for_container": Signals PDF completion.
             - "error": Sends error messages if validation or processing fails.
             - "stream_stopped": Indicates the end of the streaming session.
@@ -90,8 +127,12 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
             raise ValueError("Missing prompt or selected files.")
 
         model = _get_model(data)
+        answer_cache = get_answer_cache()
+        enhanced_prompt = None
         pdf_dir = current_app.config["PDF_DIRECTORY"]
+        max_parallel = max(1, int(current_app.config["MAX_PARALLEL_DOCUMENTS"]))
 
+        jobs = {}
         for pdf_filename in selected_files:
             pdf_path = pdf_dir / pdf_filename
             pdf_name_to_show = extract_title_from_filename(pdf_filename)
@@ -101,6 +142,7 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
                 f"Processing '{pdf_name_to_show}' for SID {sid} with container ID {container_id}"
             )
 
+            # containers are created up front, in selection order
             container_html = render_template(
                 "output.html",
                 container_title=pdf_name_to_show,
@@ -108,14 +150,10 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
             )
             yield {"event": "new_container", "payload": {"html": container_html}}
 
-            accumulated_text = ""
-            final_markdown_content = ""
-
             collection_name = generate_vector_db_document_name(
                 pdf_path.stem,
                 max_length=current_app.config["CHROMADB_MAX_FILENAME_LENGTH"],
             )
-
             rag_args = {
                 "prompt": prompt,
                 "pdf_name": pdf_name_to_show,
@@ -130,45 +168,90 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
                 "collection_name": collection_name,
                 "rag_doc_slider": str(data.get("ragDocSlider")),
             }
+            scope = _answer_scope(rag_args, data)
+
+            cached_answer = answer_cache.get(scope, prompt)
+            if cached_answer is not None:
+                log.info(f"Answer cache hit for '{pdf_name_to_show}' (SID {sid}).")
+                renderer = IncrementalMarkdownRenderer()
+                renderer.feed(cached_answer)
+                yield from _finish_container(
+                    container_id,
+                    pdf_name_to_show,
+                    collection_name,
+                    prompt,
+                    renderer,
+                    sid,
+                )
+                continue
+
+            # enhancement does not depend on the document: one request, started with
+            # the first uncached document, shared by all and overlapping their retrieval
+            if enhanced_prompt is None and rag_args["enhancer_checkbox"] == "True":
+                enhanced_prompt = enhance_prompt_async(prompt, model)
+            rag_args["enhanced_prompt"] = enhanced_prompt
+            jobs[container_id] = (pdf_name_to_show, collection_name, rag_args, scope)
+
+        log.debug(f"Answer cache: {answer_cache.stats()}")
+        if not jobs:
+            return
+
+        results: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        failed = set()
+        renderers = {
+            container_id: IncrementalMarkdownRenderer() for container_id in jobs
+        }
+        executor = ThreadPoolExecutor(
+            max_workers=min(max_parallel, len(jobs)), thread_name_prefix="doc-query"
+        )
+        try:
+            for container_id, (_, _, rag_args, _) in jobs.items():
+                executor.submit(
+                    _stream_document, container_id, rag_args, results, cancelled
+                )
 
-            for chunk in process_query_with_rag(**rag_args):
-                if "content" in chunk:
-                    accumulated_text += chunk["content"]
-                    final_markdown_content = markdown.markdown(accumulated_text)
+            pending = len(jobs)
+            while pending:
+                try:
+                    container_id, chunk = results.get(timeout=STOP_POLL_SECONDS)
+                except queue.Empty:
+                    if should_stop is not None and should_stop():
+                        log.info(f"Stopping document workers for SID: {sid}")
+                        return
+                    continue
+                renderer = renderers[container_id]
+                if chunk is None:
+                    pending -= 1
+                    pdf_name_to_show, collection_name, _, scope = jobs[container_id]
+                    if container_id not in failed and renderer.text:
+                        answer_cache.put(scope, prompt, renderer.text)
+                    yield from _finish_container(
+                        container_id,
+                        pdf_name_to_show,
+                        collection_name,
+                        prompt,
+                        renderer,
+                        sid,
+                    )
+                elif "content" in chunk:
+                    html_delta, tail_html = renderer.feed(chunk["content"])
                     yield {
-                        "event": "update_content",
+                        "event": "append_content",
                         "payload": {
                             "container_id": container_id,
-                            "html": final_markdown_content,
+                            "html": html_delta,
+                            "tail_html": tail_html,
                         },
                     }
                 elif "error" in chunk:
+                    failed.add(container_id)
                     log.error(f"Error chunk received for SID {sid}: {chunk['error']}")
                     yield {"event": "error", "payload": {"message": chunk["error"]}}
-                    break
-
-            chat_history = [
-                {"role": "user", "parts": [prompt]},
-                {"role": "model", "parts": [accumulated_text]},
-            ]
-            data_to_cache = {
-                "title": pdf_name_to_show,
-                "content": final_markdown_content,
-                "chat_history": chat_history,
-                "collection_name": collection_name,
-            }
-            cache.set(container_id, data_to_cache, timeout=3600)
-
-            session_map_key = f"session_map_{sid}"
-            session_ids = cache.get(session_map_key) or []
-            if container_id not in session_ids:
-                session_ids.append(container_id)
-                cache.set(session_map_key, session_ids, timeout=3600)
-
-            yield {
-                "event": "processing_complete_for_container",
-                "payload": {"container_id": container_id},
-            }
+        finally:
+            # reached on completion and when the caller stops consuming (stop_processing)
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
     except Exception as e:
         log.error(f"Service layer error in process_document_query for SID {sid}: {e}")
@@ -176,6 +259,100 @@ def process_document_query(data: dict, sid: str) -> Iterator[dict]:
         yield {"event": "error", "payload": {"message": str(e)}}
 
 
+def _answer_scope(rag_args: dict, data: dict) -> tuple:
+    """
+    Everything besides the prompt that shapes an answer, used as answer cache scope.
+
+    The collection's ingest version is part of it, so answers about a document are not
+    reused once the document was re-ingested.
+    """
+    return (
+        rag_args["collection_name"],
+        get_collection_registry().ingest_version(
+            rag_args["chroma_client"], rag_args["collection_name"]
+        ),
+        rag_args["model"].model_name,
+        str(data.get("show_pages_checkbox")),
+        rag_args["temperature_slider_value"],
+        rag_args["change_length_checkbox"],
+        rag_args["output_size"],
+        rag_args["enhancer_checkbox"],
+        rag_args["rag_doc_slider"],
+    )
+
+
+def _stream_document(
+    container_id: str,
+    rag_args: dict,
+    results: queue.Queue,
+    cancelled: threading.Event,
+) -> None:
+    """
+    Runs retrieval and generation for one document on a worker thread.
+
+    Chunks are put on the shared results queue tagged with the container id, followed
+    by a None marker once the document is done. Stops early when cancelled is set.
+    """
+    stream = process_query_with_rag(**rag_args)
+    try:
+        for chunk in stream:
+            if cancelled.is_set():
+                log.info(f"Cancelled processing of container {container_id}")
+                break
+            results.put((container_id, chunk))
+            if "error" in chunk:
+                break
+    except Exception as e:
+        log.error(f"Worker error for container {container_id}: {e}")
+        results.put((container_id, {"error": str(e)}))
+    finally:
+        stream.close()
+        results.put((container_id, None))
+
+
+def _finish_container(
+    container_id: str,
+    pdf_name_to_show: str,
+    collection_name: str,
+    prompt: str,
+    renderer: IncrementalMarkdownRenderer,
+    sid: str,
+) -> Iterator[dict]:
+    """Sends the final render of a document's answer and caches it for follow-up chat."""
+    # one full render at the end replaces the streamed blocks with the canonical html
+    final_markdown_content = renderer.render_full()
+    yield {
+        "event": "update_content",
+        "payload": {
+            "container_id": container_id,
+            "html": final_markdown_content,
+        },
+    }
+
+    chat_history = [
+        {"role": "user", "parts": [prompt]},
+        {"role": "model", "parts": [renderer.text]},
+    ]
+    data_to_cache = {
+        "title": pdf_name_to_show,
+        "content": final_markdown_content,
+        "chat_history": chat_history,
+        "collection_name": collection_name,
+    }
+    cache.set(container_id, data_to_cache, timeout=3600)
+
+    session_map_key = f"session_map_{sid}"
+    session_ids = cache.get(session_map_key) or []
+    if container_id not in session_ids:
+        session_ids.append(container_id)
+        cache.set(session_map_key, session_ids, timeout=3600)
+
+    yield {
+        "event": "processing_complete_for_container",
+        "payload": {"container_id": container_id},
+    }
+
+
 def process_chat_query(data: dict, sid: str) -> Iterator[dict]:
     """
     Generator function that processes a follow-up chat message and yields results.
@@ -248,6 +425,7 @@ def process_chat_query(data: dict, sid: str) -> Iterator[dict]:
             "chroma_client": chroma_client,
             "collection_name": collection_name,
             "rag_doc_slider": str(data.get("ragDocSlider")),
+            "use_context_cache": current_app.config["GEMINI_CONTEXT_CACHING"],
         }
 
         accumulated_text = ""
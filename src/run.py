@@ -1,6 +1,30 @@
-from main_app import create_app, socketio
+import os
+
+# cooperative servers have to patch the standard library before anything else is imported
+ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+if ASYNC_MODE == "gevent":
+    from gevent import monkey  # type: ignore[import-untyped, unused-ignore]
+
+    monkey.patch_all()
+    # the Gemini SDK talks gRPC, which has to be told to yield to the gevent hub
+    from grpc.experimental import gevent as grpc_gevent  # type: ignore[import-untyped]
+
+    grpc_gevent.init_gevent()
+elif ASYNC_MODE == "eventlet":
+    import eventlet  # type: ignore[import-not-found]
+
+    eventlet.monkey_patch()
+
+from main_app import create_app, socketio  # noqa: E402
 
 app = create_app()
 
 if __name__ == "__main__":
-    socketio.run(app, debug=True, allow_unsafe_werkzeug=True)
+    if ASYNC_MODE == "threading":
+        socketio.run(app, debug=True, allow_unsafe_werkzeug=True)
+    else:
+        socketio.run(
+            app,
+            host=os.getenv("HOST", "127.0.0.1"),
+            port=int(os.getenv("PORT", "5000")),
+        )
@@ -45,6 +45,21 @@ document.addEventListener('DOMContentLoaded', function() {
         'new_container': function(data) {
             outputDiv.insertAdjacentHTML('beforeend', data.html);
         },
+        'append_content': function(data) {
+            const container = document.getElementById(data.container_id);
+            if (!container) return;
+            // closed markdown blocks are appended once; only the open tail block is replaced
+            let tail = container.querySelector(':scope > .streaming-tail');
+            if (!tail) {
+                tail = document.createElement('div');
+                tail.className = 'streaming-tail';
+                container.appendChild(tail);
+            }
+            if (data.html) {
+                tail.insertAdjacentHTML('beforebegin', data.html);
+            }
+            tail.innerHTML = data.tail_html;
+        },
         'update_content': function(data) {
             const container = document.getElementById(data.container_id);
             if (container) {
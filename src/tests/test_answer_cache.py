@@ -0,0 +1,47 @@
+from backend.chatbot.answer_cache import AnswerCache, normalize_prompt
+
+
+def _embed(prompt: str) -> list[float]:
+    return [1.0, 0.0] if "ryzyk" in normalize_prompt(prompt) else [0.0, 1.0]
+
+
+def test_normalized_and_semantic_matches() -> None:
+    cache = AnswerCache(embed=_embed, similarity_threshold=0.9)
+    scope = ("collection", "gemini-2.0-flash", 0.0)
+    cache.put(scope, "Jakie są wymagania dot. zarządzania ryzykiem?", "answer")
+
+    assert cache.get(scope, "jakie sa  wymagania dot. zarzadzania ryzykiem") == "answer"
+    assert cache.get(scope, "Opisz zarządzanie ryzykiem") == "answer"
+    assert cache.get(scope, "Summarize the document") is None
+    assert cache.get(("other", "gemini-2.0-flash", 0.0), "Opisz ryzyko") is None
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_ttl_and_size_bound() -> None:
+    now = [0.0]
+    cache = AnswerCache(
+        max_entries=2,
+        ttl_seconds=60.0,
+        similarity_threshold=None,
+        clock=lambda: now[0],
+    )
+    for prompt in ["a", "b", "c"]:
+        cache.put("scope", prompt, prompt)
+    assert cache.stats()["entries"] == 2
+    assert cache.get("scope", "a") is None
+
+    now[0] = 60.0
+    assert cache.get("scope", "c") == "c"
+    now[0] = 60.5
+    assert cache.get("scope", "c") is None
+
+
+def test_semantic_matching_is_opt_in() -> None:
+    cache = AnswerCache(embed=_embed)
+    cache.put("scope", "Jakie są wymagania dot. zarządzania ryzykiem?", "answer")
+
+    assert cache.get("scope", "Opisz zarządzanie ryzykiem") is None
+    assert cache.get("scope", "jakie sa wymagania dot. zarzadzania ryzykiem") == (
+        "answer"
+    )
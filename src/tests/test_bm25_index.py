@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from backend.rag.bm25_index import (
+    BM25Index,
+    build_bm25_index,
+    load_bm25_index,
+    tokenize,
+)
+
+DOCUMENTS = [
+    "Zarządzanie ryzykiem operacyjnym w bankach spółdzielczych i zrzeszeniach.",
+    "Rekomendacja dotyczy ryzyka kredytowego i ryzyka operacyjnego.",
+    "Sprawozdawczość finansowa zakładów ubezpieczeń.",
+    "Rekomendacje KNF dla banków.",
+]
+IDS = [f"{i}-0" for i in range(len(DOCUMENTS))]
+
+
+def test_tokenize_folds_inflection() -> None:
+    assert tokenize("Rekomendacji S") == tokenize("rekomendacja s")
+    assert tokenize("i w na") == []
+
+
+def test_search_ranking_order() -> None:
+    index = BM25Index.build(IDS, DOCUMENTS)
+
+    hits = index.search("ryzyka operacyjnego", 10)
+    # the chunk mentioning both terms ranks first, unrelated chunks are left out
+    assert [chunk_id for chunk_id, _ in hits] == ["1-0", "0-0"]
+    assert hits[0][1] > hits[1][1] > 0
+    assert [chunk_id for chunk_id, _ in index.search("rekomendacja", 10)] == [
+        "3-0",
+        "1-0",
+    ]
+    assert len(index.search("ryzyka operacyjnego", 1)) == 1
+
+
+def test_search_ties_keep_chunk_order() -> None:
+    documents = (
+        ["ryzyko płynności"] * 2 + ["ryzyko banku"] * 6 + ["ryzyko płynności"] * 2
+    )
+    index = BM25Index.build([str(i) for i in range(10)], documents)
+
+    hits = index.search("ryzyko płynności", 10)
+    assert [chunk_id for chunk_id, _ in hits] == list("0189234567")
+    # ties at the cut are decided by position too
+    hits = index.search("ryzyko płynności", 7)
+    assert [chunk_id for chunk_id, _ in hits] == list("0189234")
+    assert [chunk_id for chunk_id, _ in index.search("banku", 2)] == ["2", "3"]
+
+
+def test_search_without_matches() -> None:
+    assert BM25Index.build([], []).search("ryzyko", 5) == []
+    index = BM25Index.build(IDS, DOCUMENTS)
+    assert index.search("kryptowaluty", 5) == []
+    assert index.search("i w na", 5) == []
+    assert index.search("ryzyko", 0) == []
+
+
+def test_max_score_bounds_scores() -> None:
+    index = BM25Index.build(IDS, DOCUMENTS)
+    for query in ("ryzyka operacyjnego", "rekomendacja banki", "ryzyka kryptowalut"):
+        bound = index.max_score(query)
+        assert all(0 < score < bound for _, score in index.search(query, 10))
+    assert index.max_score("i w na") == 0
+
+
+def test_persisted_index_round_trip(tmp_path: Path) -> None:
+    db_path = str(tmp_path)
+    assert load_bm25_index(db_path, "doc_missing") is None
+
+    built = build_bm25_index(db_path, "doc_test", IDS, DOCUMENTS)
+    loaded = load_bm25_index(db_path, "doc_test")
+    assert loaded is not None
+    assert loaded.search("ryzyka", 10) == built.search("ryzyka", 10) != []
+
+    (tmp_path / "bm25" / "doc_broken.json").write_text("{", encoding="utf-8")
+    assert load_bm25_index(db_path, "doc_broken") is None
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import chromadb
+
+from backend.rag.chroma_collection_manager import (
+    get_distance_space,
+    get_similarity_threshold,
+    set_similarity_threshold,
+)
+from backend.rag.create_chromadb import hnsw_metadata, open_document_collection
+
+
+def test_set_similarity_threshold_keeps_hnsw_settings(tmp_path: Path) -> None:
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    open_document_collection(client, "doc_test", hnsw_metadata(space="cosine"))
+
+    set_similarity_threshold(client, "doc_test", 0.42)
+
+    collection = client.get_collection("doc_test")
+    assert get_similarity_threshold(collection) == 0.42
+    assert get_distance_space(collection) == "cosine"
+    assert "embedding_model" in (collection.metadata or {})
@@ -0,0 +1,82 @@
+from typing import Any
+
+from backend.rag.chunking import chunk_page, merge_adjacent_chunks
+
+TEXT = " ".join(f"Zdanie numer {i} opisuje ryzyko." for i in range(40))
+
+
+def test_chunk_page_overlapping_windows() -> None:
+    chunks = chunk_page(4, 5, TEXT, strategy="sentence", chunk_tokens=40)
+
+    assert len(chunks) > 1
+    assert [chunk.chunk_id for chunk in chunks] == [
+        f"4-{i}" for i in range(len(chunks))
+    ]
+    for chunk in chunks:
+        meta = chunk.metadata
+        assert meta["page_number"] == 5
+        assert TEXT[meta["char_start"] : meta["char_end"]] == chunk.text
+        assert len(chunk.text) <= 40 * 3.5
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.metadata["char_start"] < previous.metadata["char_end"]
+    assert chunks[-1].metadata["char_end"] == len(TEXT)
+
+
+def test_chunk_page_page_strategy_and_blank_page() -> None:
+    chunks = chunk_page(2, 3, "  Cała strona.  ", strategy="page")
+    assert [(c.chunk_id, c.text) for c in chunks] == [("2", "Cała strona.")]
+    assert chunk_page(0, 1, " \n ") == []
+
+
+def _meta(page: int, index: int, start: int, end: int) -> dict[str, Any]:
+    return {
+        "page_number": page,
+        "chunk_index": index,
+        "char_start": start,
+        "char_end": end,
+    }
+
+
+def test_merge_overlapping_windows_of_a_page() -> None:
+    chunks = chunk_page(0, 7, TEXT, strategy="sentence", chunk_tokens=40)
+    assert len(chunks) >= 4
+    first, second = chunks[1], chunks[2]
+    assert second.metadata["char_start"] < first.metadata["char_end"]
+
+    # ranked hits arrive best first, in any page order
+    merged = merge_adjacent_chunks(
+        [(second.text, second.metadata), (first.text, first.metadata)]
+    )
+    start, end = first.metadata["char_start"], second.metadata["char_end"]
+    assert merged == [(TEXT[start:end], 7)]
+
+
+def test_merge_adjacent_and_separate_chunks() -> None:
+    hits = [
+        ("alfa beta", _meta(1, 0, 0, 9)),
+        ("inna strona", _meta(2, 1, 0, 11)),
+        ("gamma", _meta(1, 1, 10, 15)),
+        ("daleko", _meta(1, 5, 50, 56)),
+        ("cała strona", {"page_number": 3}),
+    ]
+
+    assert merge_adjacent_chunks(hits) == [
+        # consecutive windows without overlap are joined with a space
+        ("alfa beta gamma", 1),
+        # same chunk index on another page is not a neighbour
+        ("inna strona", 2),
+        ("daleko", 1),
+        # page-level chunks pass through
+        ("cała strona", 3),
+    ]
+
+
+def test_merge_bridges_groups_and_skips_contained_chunks() -> None:
+    hits = [
+        ("abc", _meta(1, 0, 0, 3)),
+        ("ghi", _meta(1, 2, 6, 9)),
+        ("cdefg", _meta(1, 1, 2, 7)),
+        ("def", _meta(1, 1, 3, 6)),
+    ]
+
+    assert merge_adjacent_chunks(hits) == [("abcdefghi", 1)]
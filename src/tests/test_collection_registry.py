@@ -0,0 +1,35 @@
+import os
+from pathlib import Path
+
+import chromadb
+
+from backend.rag.collection_registry import CollectionRegistry
+from backend.rag.ingest_manifest import MANIFEST_FILENAME, start_entry
+
+
+def _start(db_path: str, file_hash: str) -> None:
+    start_entry(
+        db_path,
+        "doc_test",
+        source="doc.pdf",
+        file_hash=file_hash,
+        page_count=1,
+        embedding_model="models/embedding-001",
+    )
+
+
+def test_ingest_version_changes_when_document_is_reingested(tmp_path: Path) -> None:
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    registry = CollectionRegistry()
+    assert registry.ingest_version(client, "doc_test") is None
+
+    _start(str(tmp_path), "hash-1")
+    # the registry notices manifest changes by mtime, which may not have moved yet
+    os.utime(tmp_path / MANIFEST_FILENAME, (1, 1))
+    first = registry.ingest_version(client, "doc_test")
+    assert first is not None and first.startswith("hash-1@")
+    assert registry.ingest_version(client, "doc_test") == first
+
+    _start(str(tmp_path), "hash-2")
+    second = registry.ingest_version(client, "doc_test")
+    assert second is not None and second.startswith("hash-2@")
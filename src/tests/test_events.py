@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from run import app
+from main_app import events
+
+
+def _slots() -> BoundedSemaphore:
+    with app.app_context():
+        return events._get_stream_slots()
+
+
+def test_stream_slots_are_shared_by_concurrent_requests() -> None:
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        slots = set(pool.map(lambda _: id(_slots()), range(32)))
+    assert slots == {id(app.extensions["stream_slots"])}
+
+    semaphore = app.extensions["stream_slots"]
+    limit = app.config["MAX_CONCURRENT_STREAMS"]
+    assert all(semaphore.acquire(blocking=False) for _ in range(limit))
+    assert not semaphore.acquire(blocking=False)
+    for _ in range(limit):
+        semaphore.release()
@@ -0,0 +1,73 @@
+import pytest
+
+from backend.rag.fusion import (
+    RRF_K,
+    fuse,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+)
+
+KEYWORD = [("a", 12.0), ("b", 7.5), ("c", 3.0)]
+DENSE = [("c", 0.91), ("d", 0.80), ("a", 0.62)]
+
+
+def _ids(fused: list[tuple[str, float]]) -> list[str]:
+    return [chunk_id for chunk_id, _ in fused]
+
+
+def test_rrf_rewards_chunks_found_by_both_legs() -> None:
+    fused = reciprocal_rank_fusion({"keyword": KEYWORD, "dense": DENSE})
+
+    # a and c are ranked by both legs (1st + 3rd), so they beat b and d
+    assert _ids(fused) == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 3))
+    # equal fused scores keep the order the legs listed them in
+    assert fused[0][1] == pytest.approx(fused[1][1])
+    assert fused[2][1] == pytest.approx(fused[3][1])
+
+
+def test_rrf_weights() -> None:
+    rankings = {"keyword": KEYWORD, "dense": DENSE}
+
+    fused = reciprocal_rank_fusion(rankings, weights={"keyword": 1.0, "dense": 3.0})
+    assert _ids(fused) == ["c", "a", "d", "b"]
+    fused = reciprocal_rank_fusion(rankings, weights={"keyword": 1.0, "dense": 0.0})
+    assert _ids(fused)[:3] == ["a", "b", "c"]
+    # legs missing from the weights weigh 1.0
+    assert reciprocal_rank_fusion(rankings, weights={}) == reciprocal_rank_fusion(
+        rankings
+    )
+
+
+def test_weighted_score_fusion_normalizes_each_leg() -> None:
+    fused = dict(weighted_score_fusion({"keyword": KEYWORD, "dense": DENSE}))
+
+    # min-max normalized per leg: best 1.0, worst 0.0
+    assert fused["a"] == pytest.approx(1.0 + 0.0)
+    assert fused["b"] == pytest.approx(0.5)
+    assert fused["c"] == pytest.approx(0.0 + 1.0)
+    assert fused["d"] == pytest.approx((0.80 - 0.62) / (0.91 - 0.62))
+
+    fused = dict(
+        weighted_score_fusion(
+            {"keyword": KEYWORD, "dense": DENSE}, weights={"keyword": 2.0}
+        )
+    )
+    assert fused["a"] == pytest.approx(2.0)
+    assert fused["b"] == pytest.approx(1.0)
+
+
+def test_weighted_score_fusion_single_score_and_empty_legs() -> None:
+    fused = weighted_score_fusion({"keyword": [("a", 4.0), ("b", 4.0)], "dense": []})
+    assert fused == [("a", 1.0), ("b", 1.0)]
+    assert weighted_score_fusion({"keyword": [], "dense": []}) == []
+
+
+def test_fuse_dispatch() -> None:
+    rankings = {"keyword": KEYWORD, "dense": DENSE}
+
+    assert fuse(rankings) == reciprocal_rank_fusion(rankings)
+    assert fuse(rankings, method="weighted") == weighted_score_fusion(rankings)
+    assert fuse({}) == []
+    with pytest.raises(ValueError, match="Unknown fusion method"):
+        fuse(rankings, method="borda")
@@ -0,0 +1,41 @@
+from backend.rag.ingest_manifest import ManifestEntry, plan_ingest
+
+MODEL = "models/embedding-001"
+LAYOUT = "sentence:256/48"
+
+
+def _entry(**overrides: object) -> ManifestEntry:
+    entry: ManifestEntry = {
+        "source": "doc.pdf",
+        "file_hash": "hash",
+        "page_count": 3,
+        "chunk_ids": ["0-0", "1-0", "2-0"],
+        "embedding_model": MODEL,
+        "chunking": LAYOUT,
+        "complete": True,
+        "timestamp": 0,
+    }
+    entry.update(overrides)  # type: ignore[typeddict-item]
+    return entry
+
+
+def test_plan_ingest_with_manifest_entry() -> None:
+    assert plan_ingest(_entry(), "hash", MODEL, True, LAYOUT) == "skip"
+    assert plan_ingest(_entry(complete=False), "hash", MODEL, True, LAYOUT) == "resume"
+    assert plan_ingest(_entry(), "new-hash", MODEL, True, LAYOUT) == "rebuild"
+    assert plan_ingest(_entry(), "hash", "models/other", True, LAYOUT) == "rebuild"
+    assert plan_ingest(_entry(), "hash", MODEL, True, "token:256/48") == "rebuild"
+    assert plan_ingest(_entry(), "hash", MODEL, False, LAYOUT) == "rebuild"
+
+
+def test_plan_ingest_without_manifest_entry() -> None:
+    # collections built before chunking record no layout (or no metadata at all)
+    legacy = {"embedding_model": MODEL}
+    assert plan_ingest(None, "hash", MODEL, True, LAYOUT, legacy) == "rebuild"
+    assert plan_ingest(None, "hash", MODEL, True, LAYOUT, None) == "rebuild"
+
+    current = {"embedding_model": MODEL, "chunking": LAYOUT}
+    assert plan_ingest(None, "hash", MODEL, True, LAYOUT, current) == "resume"
+    assert plan_ingest(None, "hash", "models/other", True, LAYOUT, current) == "rebuild"
+    assert plan_ingest(None, "hash", MODEL, True, "page", current) == "rebuild"
+    assert plan_ingest(None, "hash", MODEL, False, LAYOUT, current) == "rebuild"
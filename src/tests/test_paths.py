@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_backend_caches_do_not_import_the_web_app(tmp_path: Path) -> None:
+    # extraction workers and the ingestion CLI import these modules; pulling in
+    # main_app would build the Flask app objects and open a Chroma client
+    code = (
+        "import sys\n"
+        "import backend.utils.extract_text, backend.rag.embedding_cache\n"
+        "import backend.chatbot.context_cache, backend.chatbot.file_upload_cache\n"
+        "from backend.utils.paths import CACHE_DIR\n"
+        "assert 'main_app' not in sys.modules and 'flask' not in sys.modules\n"
+        "print(CACHE_DIR)\n"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "KNF_CACHE_DIR": str(tmp_path)}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str(tmp_path)
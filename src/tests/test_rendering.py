@@ -0,0 +1,19 @@
+import markdown
+
+from main_app.rendering import IncrementalMarkdownRenderer
+
+
+def test_incremental_render_matches_full_render() -> None:
+    text = (
+        "# Title\n\nFirst paragraph with **bold** text.\n\n"
+        "- item one\n- item two\n\n- item three\n\n"
+        "```python\nx = 1\n\ny = 2\n```\n\nLast paragraph."
+    )
+    renderer = IncrementalMarkdownRenderer()
+    appended = ""
+    for start in range(0, len(text), 7):
+        html, tail_html = renderer.feed(text[start : start + 7])
+        appended += html
+    streamed = (appended + tail_html).replace(">\n<", "><")
+    assert streamed == markdown.markdown(text).replace(">\n<", "><")
+    assert renderer.render_full() == markdown.markdown(text)
@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import chromadb
+import pytest
+
+from backend.rag import setup_db_async
+from backend.rag.bm25_index import load_bm25_index
+from backend.rag.ingest_manifest import get_entry
+from backend.rag.ingest_runtime import shutdown_ingest_runtime
+
+PAGES = [(number, f"Strona {number} opisuje ryzyko. " * 40) for number in (1, 2, 3)]
+
+
+class _StubEmbedder:
+    """Counts embedded texts and fails on the given call."""
+
+    def __init__(self, fail_on_call: int | None = None) -> None:
+        self.calls = 0
+        self.texts = 0
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("quota exceeded")
+        self.texts += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def pipeline(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Any]:
+    db_path = str(tmp_path / "db")
+    monkeypatch.setattr(setup_db_async, "CHROMA_DB_PATH", db_path)
+    monkeypatch.setattr(
+        setup_db_async, "client", chromadb.PersistentClient(path=db_path)
+    )
+    # small batches so a document is written in several of them
+    monkeypatch.setattr(setup_db_async, "PIPELINE_BATCH_SIZE", 4)
+    monkeypatch.setattr(
+        setup_db_async,
+        "iter_pdf_pages",
+        lambda path, executor=None, file_hash=None: iter(PAGES),
+    )
+    pdf = tmp_path / "Rekomendacja A.pdf"
+    pdf.write_bytes(b"%PDF-1.4 stub")
+    yield pdf
+    shutdown_ingest_runtime()
+
+
+def _ingest(
+    pdf: Path, embedder: _StubEmbedder, monkeypatch: Any, **settings: Any
+) -> None:
+    monkeypatch.setattr(setup_db_async, "embed_documents", embedder)
+    asyncio.run(
+        asyncio.wait_for(setup_db_async.setup_chroma_db_async([pdf], **settings), 30)
+    )
+
+
+def test_failed_ingest_is_resumed_then_skipped(
+    pipeline: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    name = setup_db_async.generate_vector_db_document_name(pipeline, max_length=60)
+
+    _ingest(pipeline, _StubEmbedder(fail_on_call=2), monkeypatch)
+    entry = get_entry(setup_db_async.CHROMA_DB_PATH, name)
+    assert entry is not None and not entry["complete"]
+    stored = setup_db_async.client.get_collection(name).count()
+
+    resumed = _StubEmbedder()
+    _ingest(pipeline, resumed, monkeypatch)
+    entry = get_entry(setup_db_async.CHROMA_DB_PATH, name)
+    assert entry is not None and entry["complete"]
+    ids = setup_db_async.client.get_collection(name).get(include=[])["ids"]
+    assert sorted(ids) == sorted(entry["chunk_ids"])
+    # only the chunks missing after the failure were embedded again
+    assert resumed.texts == len(ids) - stored > 0
+    # finishing the document built its keyword index over every chunk
+    index = load_bm25_index(setup_db_async.CHROMA_DB_PATH, name)
+    assert index is not None and sorted(index.ids) == sorted(ids)
+
+    skipped = _StubEmbedder()
+    _ingest(pipeline, skipped, monkeypatch)
+    assert skipped.calls == 0
+
+
+def test_stage_failure_is_raised(
+    pipeline: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def broken_chunker(*args: Any, **kwargs: Any) -> list:
+        raise ValueError("broken chunker")
+
+    monkeypatch.setattr(setup_db_async, "chunk_page", broken_chunker)
+    # more pages than the page queue holds, so the extractor blocks on it
+    monkeypatch.setattr(setup_db_async, "PAGE_QUEUE_SIZE", 2)
+    monkeypatch.setattr(
+        setup_db_async,
+        "iter_pdf_pages",
+        lambda path, executor=None, file_hash=None: iter(PAGES * 4),
+    )
+    with pytest.raises(ValueError, match="broken chunker"):
+        _ingest(pipeline, _StubEmbedder(), monkeypatch)
+
+
+def test_ingest_applies_hnsw_settings(
+    pipeline: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    name = setup_db_async.generate_vector_db_document_name(pipeline, max_length=60)
+
+    _ingest(
+        pipeline,
+        _StubEmbedder(),
+        monkeypatch,
+        space="l2",
+        hnsw_m=8,
+        construction_ef=64,
+        search_ef=32,
+    )
+
+    metadata = setup_db_async.client.get_collection(name).metadata or {}
+    assert metadata["hnsw:space"] == "l2"
+    assert metadata["hnsw:M"] == 8
+    assert metadata["hnsw:construction_ef"] == 64
+    assert metadata["hnsw:search_ef"] == 32